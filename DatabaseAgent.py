@@ -1,14 +1,375 @@
-from neo4j import GraphDatabase
-from typing import List, Dict, Optional
+from neo4j import READ_ACCESS, AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import hashlib
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from Tracing import span
+
+# Errors worth retrying a whole batch for; anything else is a real failure.
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+# Every statement is IF NOT EXISTS, so ensure_schema() is safe to run on each startup.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT paper_id_unique IF NOT EXISTS FOR (p:Paper) REQUIRE p.paper_id IS UNIQUE",
+    "CREATE RANGE INDEX paper_year IF NOT EXISTS FOR (p:Paper) ON (p.year)",
+    "CREATE RANGE INDEX paper_published_date IF NOT EXISTS FOR (p:Paper) ON (p.published_date)",
+    "CREATE RANGE INDEX paper_year_paper_id IF NOT EXISTS FOR (p:Paper) ON (p.year, p.paper_id)",
+    "CREATE CONSTRAINT ingest_state_topic_unique IF NOT EXISTS FOR (s:IngestState) REQUIRE s.topic IS UNIQUE",
+    "CREATE CONSTRAINT author_name_unique IF NOT EXISTS FOR (a:Author) REQUIRE a.name IS UNIQUE",
+    "CREATE RANGE INDEX paper_arxiv_id IF NOT EXISTS FOR (p:Paper) ON (p.arxiv_id)",
+]
+
+# Matches new-style (2301.01234v2) and old-style (cs/0112017) ids in abs and pdf URLs
+ARXIV_ID_PATTERN = re.compile(r"arxiv\.org/(?:abs|pdf)/(.+?)(?:v\d+)?(?:\.pdf)?$")
+
+# Properties that make up a paper's content hash; artifacts are derived from these
+CONTENT_FIELDS = ["title", "authors", "published_date", "summary", "url"]
+
+# Read queries shared by the sync and async database classes
+PAPER_RETURN = """
+RETURN p.paper_id AS paper_id, p.title AS title, p.authors AS authors, p.published_date AS published_date,
+    p.summary AS summary, p.url AS url,
+    p.key_points AS key_points, p.key_points_version AS key_points_version,
+    p.future_work AS future_work, p.future_work_version AS future_work_version
+"""
+
+PAPERS_BY_YEAR_QUERY = """
+MATCH (p:Paper)
+WHERE p.year = $year
+""" + PAPER_RETURN
+
+PAPER_BY_ID_QUERY = """
+MATCH (p:Paper {paper_id: $paper_id})
+""" + PAPER_RETURN
+
+PAPERS_BY_AUTHOR_QUERY = """
+MATCH (:Author {name: $name})-[:AUTHORED]->(p:Paper)
+RETURN p.paper_id AS paper_id, p.title AS title, p.year AS year, p.published_date AS published_date
+ORDER BY p.published_date DESC
+LIMIT $limit
+"""
+
+# Neighbours within two hops of p, scored by how they connect: shared authors count most,
+# then direct links, then papers two links away. arXiv only lists a paper's own abs, pdf
+# and DOI URLs as its links, not its citations, so LINKS_TO edges are rare and weak evidence.
+# Each branch stops after $branch_limit distinct papers, so a hub paper or a common author
+# name (Authors are merged by name alone) cannot make the query expand every path.
+RELATED_PAPERS_SUBQUERY = """
+CALL {
+    WITH p
+    MATCH (p)<-[:AUTHORED]-(:Author)-[:AUTHORED]->(other:Paper)
+    WHERE other <> p
+    WITH DISTINCT other LIMIT $branch_limit
+    RETURN other, 2 AS weight
+    UNION ALL
+    WITH p
+    MATCH (p)-[:LINKS_TO]-(other:Paper)
+    WHERE other <> p
+    WITH DISTINCT other LIMIT $branch_limit
+    RETURN other, 1 AS weight
+    UNION ALL
+    WITH p
+    MATCH (p)-[:LINKS_TO]-(:Paper)-[:LINKS_TO]-(other:Paper)
+    WHERE other <> p
+    WITH DISTINCT other LIMIT $branch_limit
+    RETURN other, 0.5 AS weight
+}
+WITH p, other, sum(weight) AS score
+"""
+
+RELATED_PAPERS_QUERY = """
+MATCH (p:Paper {paper_id: $paper_id})""" + RELATED_PAPERS_SUBQUERY + """RETURN other.paper_id AS paper_id, other.title AS title, other.year AS year, score
+ORDER BY score DESC, other.year DESC
+LIMIT $limit
+"""
+
+# The same neighbourhoods for several papers in one round trip, grouped per paper
+RELATED_PAPERS_MANY_QUERY = """
+UNWIND $paper_ids AS paper_id
+MATCH (p:Paper {paper_id: paper_id})""" + RELATED_PAPERS_SUBQUERY + """ORDER BY score DESC, other.year DESC
+WITH p, collect({paper_id: other.paper_id, title: other.title, year: other.year, score: score}) AS related
+RETURN p.paper_id AS paper_id, related[..$limit] AS related
+"""
+
+# Distinct papers each branch of the related papers query may reach
+RELATED_BRANCH_LIMIT = 200
+
+# Replaces a paper's AUTHORED edges and links it to the stored papers its links point at.
+# Papers stored later are not linked back; a later refresh of this paper picks them up.
+PAPER_GRAPH_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Paper {paper_id: row.paper_id})
+SET p.arxiv_id = row.arxiv_id
+WITH p, row
+OPTIONAL MATCH (p)<-[old:AUTHORED]-(:Author)
+DELETE old
+WITH DISTINCT p, row
+FOREACH (name IN row.authors |
+    MERGE (a:Author {name: name})
+    MERGE (a)-[:AUTHORED]->(p)
+)
+WITH p, row
+UNWIND row.link_ids AS link_id
+MATCH (target:Paper {arxiv_id: link_id})
+WHERE target <> p
+MERGE (p)-[:LINKS_TO]->(target)
+"""
+
+# Fields a caller may project when listing papers
+PAPER_FIELDS = ["paper_id", "title", "authors", "published_date", "summary", "url"]
+
+# Precomputed per-paper artifacts; each is stored next to the template version that produced it
+ARTIFACT_FIELDS = ["key_points", "key_points_version", "future_work", "future_work_version"]
+
+def driver_config_from_env() -> Dict:
+    """
+    Connection pool settings for the Neo4j driver, read from the environment.
+
+    Size NEO4J_MAX_POOL_SIZE per process: each Uvicorn worker holds its own pool,
+    so the server sees up to workers * pool size connections.
+    """
+    return {
+        "max_connection_pool_size": int(os.environ.get("NEO4J_MAX_POOL_SIZE", "100")),
+        "connection_acquisition_timeout": float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", "60")),
+        "max_connection_lifetime": float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+        "fetch_size": int(os.environ.get("NEO4J_FETCH_SIZE", "1000")),
+    }
+
+def neo4j_settings_from_env() -> Tuple[str, str, str]:
+    return (
+        os.environ.get("NEO4J_URI", "neo4j://localhost:7687"),
+        os.environ.get("NEO4J_USER", "neo4j"),
+        os.environ.get("NEO4J_PASSWORD", "password"),
+    )
+
+class PoolMetrics:
+    def __init__(self, max_pool_size: int):
+        """
+        Session and connection acquisition statistics for one driver.
+
+        Acquisition wait is measured from the execute_read/execute_write call until the
+        transaction function first runs, which covers borrowing a connection from the pool.
+
+        Args:
+            max_pool_size (int): The driver's configured pool size.
+        """
+        self.max_pool_size = max_pool_size
+        self.sessions_in_use = 0
+        self.peak_sessions_in_use = 0
+        self.acquisitions = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def session_opened(self):
+        with self._lock:
+            self.sessions_in_use += 1
+            self.peak_sessions_in_use = max(self.peak_sessions_in_use, self.sessions_in_use)
+
+    def session_closed(self):
+        with self._lock:
+            self.sessions_in_use -= 1
+
+    def timed(self, tx_fn: Callable) -> Callable:
+        """
+        Wraps a transaction function so the wait before its first call is recorded.
+        """
+        start = time.perf_counter()
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            wait = time.perf_counter() - start
+            with self._lock:
+                self.acquisitions += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+        if inspect.iscoroutinefunction(tx_fn):
+            async def async_wrapper(tx, *args):
+                record()
+                return await tx_fn(tx, *args)
+            return async_wrapper
+
+        def wrapper(tx, *args):
+            record()
+            return tx_fn(tx, *args)
+        return wrapper
+
+    def snapshot(self, driver) -> Dict:
+        in_use, idle = self._connection_counts(driver)
+        with self._lock:
+            return {
+                "max_pool_size": self.max_pool_size,
+                "connections_in_use": in_use,
+                "connections_idle": idle,
+                "sessions_in_use": self.sessions_in_use,
+                "peak_sessions_in_use": self.peak_sessions_in_use,
+                "acquisitions": self.acquisitions,
+                "acquisition_wait_avg_ms": 1000 * self.wait_total / self.acquisitions if self.acquisitions else 0.0,
+                "acquisition_wait_max_ms": 1000 * self.wait_max,
+            }
+
+    @staticmethod
+    def _connection_counts(driver) -> Tuple[Optional[int], Optional[int]]:
+        # The driver has no public pool API; read its pool defensively and report
+        # None rather than fail if the internals change between driver versions.
+        connections = getattr(getattr(driver, "_pool", None), "connections", None)
+        if not isinstance(connections, dict):
+            return None, None
+        all_connections = [connection for queue in list(connections.values()) for connection in list(queue)]
+        in_use = sum(1 for connection in all_connections if getattr(connection, "in_use", False))
+        return in_use, len(all_connections) - in_use
+
+def arxiv_id_from_url(url: str) -> Optional[str]:
+    match = ARXIV_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def paper_from_record(record) -> Dict:
+    paper = {
+        "paper_id": record["paper_id"],
+        "title": record["title"],
+        "authors": record["authors"],
+        "published_date": record["published_date"],
+        "summary": record["summary"],
+        "url": record["url"]
+    }
+    for field in ARTIFACT_FIELDS:
+        if record.get(field) is not None:
+            paper[field] = record[field]
+    return paper
 
 class Neo4jDatabase:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, driver_config: Optional[Dict] = None):
+        """
+        Args:
+            driver_config (Optional[Dict]): Pool settings for the driver; read from the environment when omitted.
+        """
+        driver_config = driver_config or driver_config_from_env()
+        self.driver = GraphDatabase.driver(uri, auth=(user, password), **driver_config)
+        self.metrics = PoolMetrics(driver_config.get("max_connection_pool_size", 100))
 
     def close(self):
         self.driver.close()
 
+    def verify_connectivity(self):
+        self.driver.verify_connectivity()
+
+    def pool_metrics(self) -> Dict:
+        return self.metrics.snapshot(self.driver)
+
+    @contextmanager
+    def _session(self, **config) -> Iterator:
+        with span("neo4j"), self.driver.session(**config) as session:
+            self.metrics.session_opened()
+            try:
+                yield session
+            finally:
+                self.metrics.session_closed()
+
+    def ensure_schema(self):
+        """
+        Creates the constraints and indexes the queries below rely on, if they are missing.
+        """
+        with self._session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                session.run(statement).consume()
+
+    def backfill_paper_years(self, batch_size: int = 10000) -> int:
+        """
+        One-off migration that sets the integer year property on papers stored before it existed.
+
+        Args:
+            batch_size (int): Number of nodes updated per inner transaction.
+
+        Returns:
+            int: The number of papers updated.
+        """
+        with self._session() as session:
+            # CALL { } IN TRANSACTIONS needs an auto-commit transaction, hence session.run.
+            summary = session.run(
+                """
+                MATCH (p:Paper)
+                WHERE p.year IS NULL AND p.published_date IS NOT NULL
+                CALL {
+                    WITH p
+                    SET p.year = toInteger(substring(p.published_date, 0, 4))
+                } IN TRANSACTIONS OF $batch_size ROWS
+                """,
+                batch_size=batch_size
+            ).consume()
+            updated = summary.counters.properties_set
+        print(f"Backfilled the year property on {updated} papers.")
+        return updated
+
+    def backfill_paper_graph(self, batch_size: int = 1000) -> int:
+        """
+        One-off migration that creates the Author nodes, AUTHORED edges and arxiv_id
+        property for papers stored before the graph was materialized.
+
+        The links of those papers were never stored, so they get no LINKS_TO edges
+        until a harvest refreshes them.
+
+        Args:
+            batch_size (int): Number of papers read and linked per transaction.
+
+        Returns:
+            int: The number of papers updated.
+        """
+        updated = 0
+        after = ""
+        while True:
+            with self._session() as session:
+                papers = session.execute_read(self.metrics.timed(self._papers_missing_graph_tx), after, batch_size)
+                if not papers:
+                    break
+                rows = [
+                    {
+                        "paper_id": paper["paper_id"],
+                        "arxiv_id": arxiv_id_from_url(paper["url"] or ""),
+                        "authors": paper["authors"] or [],
+                        "link_ids": [],
+                    }
+                    for paper in papers
+                ]
+                session.execute_write(self.metrics.timed(self._store_paper_graph_tx), rows)
+            updated += len(rows)
+            after = papers[-1]["paper_id"]
+        print(f"Backfilled authors and arXiv ids on {updated} papers.")
+        return updated
+
+    @staticmethod
+    def _papers_missing_graph_tx(tx, after: str, limit: int) -> List[Dict]:
+        result = tx.run(
+            """
+            MATCH (p:Paper)
+            WHERE p.paper_id > $after AND p.arxiv_id IS NULL
+            RETURN p.paper_id AS paper_id, p.url AS url, p.authors AS authors
+            ORDER BY p.paper_id
+            LIMIT $limit
+            """,
+            after=after,
+            limit=limit
+        )
+        return [record.data() for record in result]
+
+    @staticmethod
+    def _store_paper_graph_tx(tx, rows: List[Dict]):
+        tx.run(PAPER_GRAPH_QUERY, rows=rows).consume()
+
+    @staticmethod
+    def make_paper_id(url: str) -> str:
+        return hashlib.md5(url.encode()).hexdigest()
+
     def store_paper(self, paper_info: Dict):
         """
         Stores a single paper in the Neo4j database and assigns a unique paper_id property.
@@ -16,29 +377,198 @@ class Neo4jDatabase:
         Args:
             paper_info (Dict): Details of the paper to store.
         """
-        paper_id = hashlib.md5(paper_info["url"].encode()).hexdigest()
+        with self._session() as session:
+            session.execute_write(self.metrics.timed(self._store_papers_batch_tx), [self._paper_row(paper_info)])
+
+    def store_papers_bulk(self, papers: Iterable[Dict], batch_size: int = 500, max_retries: int = 3) -> int:
+        """
+        Stores papers in batches, sending each batch through a single UNWIND statement.
+
+        All batches share one session, so a 10,000 paper ingest costs
+        len(papers) / batch_size round trips instead of one per paper. Papers whose
+        content hash matches the stored one are left untouched.
+
+        Args:
+            papers (Iterable[Dict]): Details of the papers to store.
+            batch_size (int): Number of papers written per transaction.
+            max_retries (int): Attempts per batch on transient errors before giving up.
+
+        Returns:
+            int: The number of papers created or changed.
+        """
+        stored = 0
+        batch = []
+
+        with self._session() as session:
+            for paper_info in papers:
+                batch.append(self._paper_row(paper_info))
+                if len(batch) >= batch_size:
+                    stored += self._write_batch(session, batch, max_retries)
+                    batch = []
+            if batch:
+                stored += self._write_batch(session, batch, max_retries)
+
+        return stored
+
+    def _write_batch(self, session, rows: List[Dict], max_retries: int) -> int:
+        for attempt in range(1, max_retries + 1):
+            start = time.perf_counter()
+            try:
+                written = session.execute_write(self.metrics.timed(self._store_papers_batch_tx), rows)
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                print(f"Batch of {len(rows)} papers failed ({e}), retrying ({attempt}/{max_retries})...")
+                time.sleep(2 ** (attempt - 1))
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"Stored batch of {len(rows)} papers in {elapsed:.2f}s ({len(rows) - written} unchanged)")
+            return written
+        return 0
+
+    @classmethod
+    def _paper_row(cls, paper_info: Dict) -> Dict:
+        row = {
+            "paper_id": cls.make_paper_id(paper_info["url"]),
+            "title": paper_info["title"],
+            "authors": paper_info["authors"],
+            "published_date": paper_info["published_date"].isoformat(),
+            "year": paper_info["published_date"].year,
+            "summary": paper_info["summary"],
+            "url": paper_info["url"]
+        }
+        content = json.dumps([row[field] for field in CONTENT_FIELDS])
+        row["content_hash"] = hashlib.sha256(content.encode()).hexdigest()
+
+        row["arxiv_id"] = arxiv_id_from_url(paper_info["url"])
+        # arXiv's links are the paper's own abs, pdf and DOI URLs, so after dropping its
+        # own id this is usually empty; it is not a citation list
+        link_ids = {arxiv_id_from_url(link) for link in paper_info.get("links", [])}
+        row["link_ids"] = sorted(link_id for link_id in link_ids if link_id and link_id != row["arxiv_id"])
+        return row
+
+    @classmethod
+    def _store_papers_batch_tx(cls, tx, rows: List[Dict]) -> int:
+        # Unchanged papers are filtered out before SET, so refreshing them is a read.
+        # Changed ones lose their artifact versions so they get regenerated, and have
+        # their author and link edges rebuilt in the same transaction.
+        result = tx.run(
+            """
+            UNWIND $rows AS row
+            MERGE (p:Paper {paper_id: row.paper_id})
+            WITH p, row
+            WHERE p.content_hash IS NULL OR p.content_hash <> row.content_hash
+            SET p.title = row.title,
+                p.authors = row.authors,
+                p.published_date = row.published_date,
+                p.year = row.year,
+                p.summary = row.summary,
+                p.url = row.url,
+                p.content_hash = row.content_hash
+            REMOVE p.key_points_version, p.future_work_version
+            RETURN p.paper_id AS paper_id
+            """,
+            rows=rows
+        )
+        written = {record["paper_id"] for record in result}
+        if written:
+            cls._store_paper_graph_tx(tx, [row for row in rows if row["paper_id"] in written])
+        return len(written)
+
+    def get_ingest_watermark(self, topic: str) -> Optional[str]:
+        """
+        Returns the ISO date before which every paper on the topic has been ingested, if any.
+        """
+        with self._session() as session:
+            return session.execute_read(self.metrics.timed(self._get_ingest_watermark_tx), topic)
 
-        with self.driver.session() as session:
-            session.write_transaction(self._store_paper_tx, paper_info, paper_id)
+    @staticmethod
+    def _get_ingest_watermark_tx(tx, topic: str) -> Optional[str]:
+        record = tx.run(
+            "MATCH (s:IngestState {topic: $topic}) RETURN s.last_published_date AS watermark",
+            topic=topic
+        ).single()
+        return record["watermark"] if record else None
+
+    def set_ingest_watermark(self, topic: str, watermark: str):
+        """
+        Moves the topic's ingest watermark forward; an older value is ignored.
+
+        Args:
+            topic (str): The harvested topic.
+            watermark (str): ISO date before which every paper on the topic is stored.
+        """
+        with self._session() as session:
+            session.execute_write(self.metrics.timed(self._set_ingest_watermark_tx), topic, watermark)
 
     @staticmethod
-    def _store_paper_tx(tx, paper_info: Dict, paper_id: str):
+    def _set_ingest_watermark_tx(tx, topic: str, watermark: str):
         tx.run(
             """
-            MERGE (p:Paper {paper_id: $paper_id})
-            SET p.title = $title,
-                p.authors = $authors,
-                p.published_date = $published_date,
-                p.summary = $summary,
-                p.url = $url
+            MERGE (s:IngestState {topic: $topic})
+            SET s.last_published_date = CASE
+                WHEN s.last_published_date IS NULL OR s.last_published_date < $watermark THEN $watermark
+                ELSE s.last_published_date
+            END
             """,
-            paper_id=paper_id,
-            title=paper_info["title"],
-            authors=paper_info["authors"],
-            published_date=paper_info["published_date"].isoformat(),
-            summary=paper_info["summary"],
-            url=paper_info["url"]
+            topic=topic,
+            watermark=watermark
+        ).consume()
+
+    def get_papers_missing_artifacts(self, versions: Dict[str, str], after: str = "", limit: int = 100) -> List[Dict]:
+        """
+        Finds papers whose stored artifacts are missing or were produced by an older template.
+
+        Paging is keyset based on the indexed paper_id: pass the last paper_id of the
+        previous page as after, so each page resumes the scan where the last one stopped
+        instead of rescanning every paper that is already up to date.
+
+        Args:
+            versions (Dict[str, str]): Current template version per artifact, e.g. {"key_points": "key_points:v1"}.
+            after (str): Only return papers whose paper_id sorts after this one.
+            limit (int): Maximum number of papers to return.
+
+        Returns:
+            List[Dict]: Paper details, including whatever artifacts are already stored, ordered by paper_id.
+        """
+        with self._session() as session:
+            return session.execute_read(
+                self.metrics.timed(self._get_papers_missing_artifacts_tx), versions, after, limit
+            )
+
+    @staticmethod
+    def _get_papers_missing_artifacts_tx(tx, versions: Dict[str, str], after: str, limit: int) -> List[Dict]:
+        stale = " OR ".join(
+            f"coalesce(p.{artifact}_version, '') <> $versions.{artifact}" for artifact in versions
         )
+        # A plain range predicate, not "$after IS NULL OR ...", so the planner seeks the paper_id index
+        query = f"MATCH (p:Paper) WHERE p.paper_id > $after AND ({stale}) {PAPER_RETURN} ORDER BY paper_id LIMIT $limit"
+        result = tx.run(query, versions=versions, after=after, limit=limit)
+        return [paper_from_record(record) for record in result]
+
+    def store_paper_artifacts(self, rows: List[Dict]):
+        """
+        Stores precomputed artifacts on their papers in a single transaction.
+
+        Args:
+            rows (List[Dict]): One dict per paper with paper_id and the artifact fields to set.
+        """
+        with self._session() as session:
+            session.execute_write(self.metrics.timed(self._store_paper_artifacts_tx), rows)
+
+    @staticmethod
+    def _store_paper_artifacts_tx(tx, rows: List[Dict]):
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MATCH (p:Paper {paper_id: row.paper_id})
+            SET p += row.artifacts
+            """,
+            rows=[
+                {"paper_id": row["paper_id"], "artifacts": {field: row[field] for field in ARTIFACT_FIELDS if field in row}}
+                for row in rows
+            ]
+        ).consume()
 
     def query_papers_by_year(self, year: int) -> List[Dict]:
         """
@@ -50,34 +580,51 @@ class Neo4jDatabase:
         Returns:
             List[Dict]: A list of dictionaries containing matching paper details.
         """
-        with self.driver.session() as session:
-            result = session.execute_read(self._query_papers_by_year, year)
-            print(f"Debug: Retrieved {len(result)} papers for year {year}")  # Debugging line
+        with self._session() as session:
+            result = session.execute_read(self.metrics.timed(self._query_papers_by_year), year)
             return result
 
     @staticmethod
     def _query_papers_by_year(tx, year: int) -> List[Dict]:
-        query = """
-        MATCH (p:Paper)
-        WHERE p.published_date STARTS WITH $year
-        RETURN p.paper_id AS paper_id, p.title AS title, p.authors AS authors, p.published_date AS published_date,
-            p.summary AS summary, p.url AS url
-        """
-        result = tx.run(query, year=str(year))
-
-        papers = []
-        for record in result:
-            papers.append({
-                "paper_id": record["paper_id"],
-                "title": record["title"],
-                "authors": record["authors"],
-                "published_date": record["published_date"],
-                "summary": record["summary"],
-                "url": record["url"]
-            })
-
-        return papers
-    
+        result = tx.run(PAPERS_BY_YEAR_QUERY, year=year)
+        return [paper_from_record(record) for record in result]
+
+    def iter_paper_texts(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Yields the paper_id, title, summary and year of every stored paper, ordered by paper_id.
+
+        Reads one keyset-paged batch per transaction, so memory stays flat on large databases.
+
+        Args:
+            batch_size (int): Number of papers read per transaction.
+
+        Yields:
+            Dict: One paper's searchable text.
+        """
+        after = ""
+        while True:
+            with self._session() as session:
+                papers = session.execute_read(self.metrics.timed(self._paper_texts_tx), after, batch_size)
+            yield from papers
+            if len(papers) < batch_size:
+                return
+            after = papers[-1]["paper_id"]
+
+    @staticmethod
+    def _paper_texts_tx(tx, after: str, limit: int) -> List[Dict]:
+        result = tx.run(
+            """
+            MATCH (p:Paper)
+            WHERE p.paper_id > $after
+            RETURN p.paper_id AS paper_id, p.title AS title, p.summary AS summary, p.year AS year
+            ORDER BY p.paper_id
+            LIMIT $limit
+            """,
+            after=after,
+            limit=limit
+        )
+        return [record.data() for record in result]
+
     def get_paper_by_id(self, paper_id: str) -> Optional[Dict]:
         """
         Retrieve a specific paper by its unique paper_id (string).
@@ -88,26 +635,215 @@ class Neo4jDatabase:
         Returns:
             Optional[Dict]: Paper details if found, otherwise None.
         """
-        with self.driver.session() as session:
-            result = session.execute_read(self._get_paper_by_id_tx, paper_id)
+        with self._session() as session:
+            result = session.execute_read(self.metrics.timed(self._get_paper_by_id_tx), paper_id)
             return result
 
     @staticmethod
     def _get_paper_by_id_tx(tx, paper_id: str) -> Optional[Dict]:
-        query = """
-        MATCH (p:Paper {paper_id: $paper_id})
-        RETURN p.title AS title, p.authors AS authors, p.published_date AS published_date,
-            p.summary AS summary, p.url AS url
-        """
-        result = tx.run(query, paper_id=paper_id).single()
+        result = tx.run(PAPER_BY_ID_QUERY, paper_id=paper_id).single()
         if result:
-            return {
-                "title": result["title"],
-                "authors": result["authors"],
-                "published_date": result["published_date"],
-                "summary": result["summary"],
-                "url": result["url"]
-            }
+            return paper_from_record(result)
         return None
 
+    def papers_by_author(self, name: str, limit: int = 50) -> List[Dict]:
+        """
+        Lists an author's papers, newest first, through the indexed Author node.
+
+        Args:
+            name (str): The author's name as arXiv lists it.
+            limit (int): Maximum number of papers to return.
+
+        Returns:
+            List[Dict]: paper_id, title, year and published_date of each paper.
+        """
+        with self._session(default_access_mode=READ_ACCESS) as session:
+            return session.execute_read(
+                self.metrics.timed(self._graph_query_tx), PAPERS_BY_AUTHOR_QUERY, {"name": name, "limit": limit}
+            )
+
+    def related_papers(self, paper_id: str, limit: int = 10) -> List[Dict]:
+        """
+        Finds papers within two hops of a paper, through links and shared authors.
+
+        Args:
+            paper_id (str): The unique paper ID.
+            limit (int): Maximum number of papers to return.
+
+        Returns:
+            List[Dict]: paper_id, title, year and score of each related paper, best connected first.
+        """
+        with self._session(default_access_mode=READ_ACCESS) as session:
+            return session.execute_read(
+                self.metrics.timed(self._graph_query_tx),
+                RELATED_PAPERS_QUERY,
+                {"paper_id": paper_id, "limit": limit, "branch_limit": RELATED_BRANCH_LIMIT}
+            )
+
+    def related_papers_many(self, paper_ids: List[str], limit: int = 10) -> Dict[str, List[Dict]]:
+        """
+        Finds the related papers of several papers in a single query.
+
+        Args:
+            paper_ids (List[str]): The unique paper IDs.
+            limit (int): Maximum number of related papers per paper.
+
+        Returns:
+            Dict[str, List[Dict]]: Each paper's related papers, as related_papers returns them;
+                a paper without any, or that is not stored, maps to an empty list.
+        """
+        with self._session(default_access_mode=READ_ACCESS) as session:
+            records = session.execute_read(
+                self.metrics.timed(self._graph_query_tx),
+                RELATED_PAPERS_MANY_QUERY,
+                {"paper_ids": paper_ids, "limit": limit, "branch_limit": RELATED_BRANCH_LIMIT}
+            )
+        related = {paper_id: [] for paper_id in paper_ids}
+        related.update({record["paper_id"]: record["related"] for record in records})
+        return related
+
+    @staticmethod
+    def _graph_query_tx(tx, query: str, params: Dict) -> List[Dict]:
+        return [record.data() for record in tx.run(query, **params)]
+
+
+class AsyncNeo4jDatabase:
+    def __init__(self, uri, user, password, driver_config: Optional[Dict] = None):
+        """
+        Read-side counterpart of Neo4jDatabase on the async driver, so the API
+        handlers can query Neo4j without blocking the event loop.
+
+        Args:
+            driver_config (Optional[Dict]): Pool settings for the driver; read from the environment when omitted.
+        """
+        driver_config = driver_config or driver_config_from_env()
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password), **driver_config)
+        self.metrics = PoolMetrics(driver_config.get("max_connection_pool_size", 100))
+
+    async def close(self):
+        await self.driver.close()
+
+    async def verify_connectivity(self):
+        await self.driver.verify_connectivity()
+
+    def pool_metrics(self) -> Dict:
+        return self.metrics.snapshot(self.driver)
+
+    @asynccontextmanager
+    async def _session(self, **config) -> AsyncIterator:
+        with span("neo4j"):
+            async with self.driver.session(**config) as session:
+                self.metrics.session_opened()
+                try:
+                    yield session
+                finally:
+                    self.metrics.session_closed()
+
+    async def ensure_schema(self):
+        async with self._session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                result = await session.run(statement)
+                await result.consume()
+
+    async def query_papers_by_year(self, year: int) -> List[Dict]:
+        """
+        Queries Neo4j for papers published in a specific year.
+
+        Args:
+            year (int): The publication year to filter.
+
+        Returns:
+            List[Dict]: A list of dictionaries containing matching paper details.
+        """
+        async with self._session() as session:
+            return await session.execute_read(self.metrics.timed(self._query_papers_by_year), year)
+
+    async def iter_papers_by_year(
+        self, year: int, fields: Optional[List[str]] = None, after: str = "", limit: int = 100
+    ) -> AsyncIterator[Dict]:
+        """
+        Yields one page of a year's papers, ordered by paper_id, as the records arrive.
+
+        Paging is keyset based: pass the last paper_id of the previous page as after.
+        Every paper_id sorts after "", so the default starts from the first paper.
+
+        Args:
+            year (int): The publication year to filter.
+            fields (Optional[List[str]]): Properties to return, from PAPER_FIELDS; paper_id is always included.
+            after (str): Only return papers whose paper_id sorts after this one.
+            limit (int): Maximum number of papers to return.
+
+        Yields:
+            Dict: The requested properties of each paper.
+        """
+        fields = fields or PAPER_FIELDS
+        unknown = set(fields) - set(PAPER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown paper fields: {', '.join(sorted(unknown))}")
+
+        projection = ["paper_id"] + [field for field in fields if field != "paper_id"]
+        query = f"""
+        MATCH (p:Paper)
+        WHERE p.year = $year AND p.paper_id > $after
+        RETURN {", ".join(f"p.{field} AS {field}" for field in projection)}
+        ORDER BY p.paper_id
+        LIMIT $limit
+        """
+
+        async with self._session(default_access_mode=READ_ACCESS) as session:
+            result = await session.run(query, year=year, after=after, limit=limit)
+            async for record in result:
+                yield record.data()
+
+    @staticmethod
+    async def _query_papers_by_year(tx, year: int) -> List[Dict]:
+        result = await tx.run(PAPERS_BY_YEAR_QUERY, year=year)
+        return [paper_from_record(record) async for record in result]
+
+    async def get_paper_by_id(self, paper_id: str) -> Optional[Dict]:
+        """
+        Retrieve a specific paper by its unique paper_id (string).
+
+        Args:
+            paper_id (str): The unique paper ID.
+
+        Returns:
+            Optional[Dict]: Paper details if found, otherwise None.
+        """
+        async with self._session() as session:
+            return await session.execute_read(self.metrics.timed(self._get_paper_by_id_tx), paper_id)
+
+    @staticmethod
+    async def _get_paper_by_id_tx(tx, paper_id: str) -> Optional[Dict]:
+        result = await tx.run(PAPER_BY_ID_QUERY, paper_id=paper_id)
+        record = await result.single()
+        if record:
+            return paper_from_record(record)
+        return None
+
+    async def papers_by_author(self, name: str, limit: int = 50) -> List[Dict]:
+        """
+        Async version of Neo4jDatabase.papers_by_author.
+        """
+        async with self._session(default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(
+                self.metrics.timed(self._graph_query_tx), PAPERS_BY_AUTHOR_QUERY, {"name": name, "limit": limit}
+            )
+
+    async def related_papers(self, paper_id: str, limit: int = 10) -> List[Dict]:
+        """
+        Async version of Neo4jDatabase.related_papers.
+        """
+        async with self._session(default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(
+                self.metrics.timed(self._graph_query_tx),
+                RELATED_PAPERS_QUERY,
+                {"paper_id": paper_id, "limit": limit, "branch_limit": RELATED_BRANCH_LIMIT}
+            )
+
+    @staticmethod
+    async def _graph_query_tx(tx, query: str, params: Dict) -> List[Dict]:
+        result = await tx.run(query, **params)
+        return [record.data() async for record in result]
+
 
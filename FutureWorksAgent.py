@@ -1,8 +1,20 @@
-from typing import List, Dict
-from langchain_ollama import OllamaLLM
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from LLMGateway import get_llm
+from LLMScheduler import BATCH, INTERACTIVE
+from PromptBuilder import PromptBuilder
+from Tracing import bind, traced
 
-# Initialize the LLM with the Ollama model "llama3.1"
-future_model = OllamaLLM(model="llama3.1")
+# Shared, cached gateway to the Ollama model "llama3.1"
+future_model = get_llm("llama3.1")
+
+FUTURE_WORK_TEMPLATE = "future_work:v2"
+
+# Related papers from the citation and author graph listed in the prompt
+RELATED_CONTEXT_PAPERS = 5
+
+# Papers whose suggestions are requested at once; the LLMScheduler caps what reaches the model
+REVIEW_WORKERS = 8
 
 class FutureWorksAgent:
     def __init__(self, papers: List[Dict]):
@@ -14,46 +26,113 @@ class FutureWorksAgent:
         """
         self.papers = papers
 
-    def generate_future_work(self, paper_index: int) -> str:
+    @traced("future_works.generate_future_work")
+    def generate_future_work(self, paper_index: int, priority: int = INTERACTIVE) -> str:
         """
         Generates future work suggestions for a given paper using a fixed prompt.
 
         Args:
             paper_index (int): Index of the paper in the list to use for future work generation.
+            priority (int): Scheduling priority of the LLM call; batch work passes LLMScheduler.BATCH.
 
         Returns:
             str: Suggested future work directions.
         """
+        stored = self.stored_future_work(paper_index)
+        if stored is not None:
+            return stored
+
+        # Get future research suggestions from the llama3.1 model
+        future_work_suggestions = future_model.invoke(
+            input=self.future_work_prompt(paper_index), template=FUTURE_WORK_TEMPLATE, priority=priority
+        )
+        return future_work_suggestions
+
+    def stored_future_work(self, paper_index: int) -> Optional[str]:
+        """
+        Returns the suggestions precomputed at ingest time by PaperArtifacts.enrich_papers,
+        or None when they are missing or were made with an older template.
+        """
+        paper = self.papers[paper_index]
+        if paper.get("future_work_version") == FUTURE_WORK_TEMPLATE:
+            return paper["future_work"]
+        return None
+
+    def future_work_prompt(self, paper_index: int) -> str:
         paper = self.papers[paper_index]
-        prompt = (
-            f"Title: {paper['title']}\n"
-            f"Summary: {paper['summary']}\n\n"
+        prompt = PromptBuilder(future_model.model)
+        prompt.add(f"Title: {paper['title']}\n", truncatable=False)
+        prompt.add(f"Summary: {paper['summary']}\n\n", priority=2)
+
+        # Titles only: enough to steer away from directions neighbouring work already covers
+        related = (paper.get("related_papers") or [])[:RELATED_CONTEXT_PAPERS]
+        if related:
+            titles = [f"- {other['title']} ({other['year']})" for other in related]
+            prompt.add("Related papers:\n" + "\n".join(titles) + "\n\n", priority=1)
+
+        prompt.add(
             "Based on the above summary, suggest potential improvements, unexplored areas, "
             "and future research directions."
+            + (" Prefer directions the related papers do not already cover." if related else ""),
+            truncatable=False
         )
+        return prompt.build()
 
-        # Get future research suggestions from the llama3.1 model
-        future_work_suggestions = future_model.invoke(input=prompt)
-        return future_work_suggestions
-
-    def create_review_paper(self) -> str:
+    def create_review_paper(self, max_workers: int = REVIEW_WORKERS) -> str:
         """
         Compiles a review paper based on the stored summaries and future work suggestions.
 
+        The suggestions for every paper are requested concurrently, at batch priority.
+
+        Args:
+            max_workers (int): Number of papers whose suggestions are requested at once.
+
         Returns:
             str: Generated review paper content.
         """
-        review_content = "Review Paper: Future Directions in Research\n\n"
+        future_works = dict(self.iter_future_works(range(len(self.papers)), max_workers))
+        return self.compose_review_paper([future_works[i] for i in range(len(self.papers))])
+
+    def iter_future_works(self, paper_indexes: Iterable[int], max_workers: int = REVIEW_WORKERS) -> Iterator[Tuple[int, str]]:
+        """
+        Generates future work suggestions for several papers concurrently, at batch priority.
+
+        Args:
+            paper_indexes (Iterable[int]): Indexes of the papers to generate suggestions for.
+            max_workers (int): Number of papers whose suggestions are requested at once.
+
+        Yields:
+            Tuple[int, str]: Each paper's index and suggestions, in completion order.
+        """
+        generate = bind(lambda index: (index, self.generate_future_work(index, priority=BATCH)))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(generate, index) for index in paper_indexes]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
 
-        for i, paper in enumerate(self.papers):
-            review_content += (
+    def compose_review_paper(self, all_future_directions: List[str]) -> str:
+        """
+        Lays out the review paper from each paper's details and its future work suggestions.
+
+        Args:
+            all_future_directions (List[str]): Suggestions for each paper, in the same order as the papers.
+
+        Returns:
+            str: Generated review paper content.
+        """
+        # Collect the sections and join once; repeated += copies the whole review per paper
+        sections = ["Review Paper: Future Directions in Research\n\n"]
+        for i, (paper, future_directions) in enumerate(zip(self.papers, all_future_directions)):
+            sections.append(
                 f"### {i + 1}. {paper['title']}\n"
                 f"**Authors**: {paper['authors']}\n"
                 f"**Published Date**: {paper['published_date']}\n"
                 f"**Summary**: {paper['summary']}\n\n"
+                f"**Future Work Suggestions**:\n{future_directions}\n\n"
             )
 
-            future_directions = self.generate_future_work(i)
-            review_content += f"**Future Work Suggestions**:\n{future_directions}\n\n"
-
-        return review_content
+        return "".join(sections)
@@ -0,0 +1,254 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from SQLiteStore import connect, immediate_transaction
+
+JOBS_PATH = os.environ.get("JOBS_DB_PATH", ".jobs.sqlite3")
+# A running job whose worker has not checked in for this long is assumed dead and requeued
+STALE_AFTER_SECONDS = float(os.environ.get("JOB_STALE_AFTER_SECONDS", 60))
+# A job whose worker died this many times (e.g. out of memory, or a crash in native code)
+# is failed rather than handed to yet another worker
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_PATH):
+        """
+        SQLite-backed queue of long-running jobs, shared by the API and the worker processes.
+
+        Jobs move from queued to running to done or failed. Workers record progress and
+        the partial results of each finished item, so a job interrupted by a crash or a
+        restart is requeued and resumes where it stopped instead of starting over.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                total INTEGER,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                item_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (job_id, item_key)
+            );
+            """
+        )
+
+    def submit(self, kind: str, params: Dict) -> str:
+        """
+        Queues a job, or returns the id of an identical one that is already queued or running.
+
+        Args:
+            kind (str): The job type, e.g. "create_review_paper".
+            params (Dict): JSON-serializable job arguments.
+
+        Returns:
+            str: The job's id.
+        """
+        encoded = json.dumps(params, sort_keys=True)
+        with self._lock, immediate_transaction(self._conn):
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE kind = ? AND params = ? AND status IN (?, ?)",
+                (kind, encoded, QUEUED, RUNNING)
+            ).fetchone()
+            if row is not None:
+                return row["job_id"]
+
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, encoded, QUEUED, time.time())
+            )
+            return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Returns a job's status, progress and, once it is done, its result.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "params": json.loads(row["params"]),
+            "status": row["status"],
+            "progress": {"done": row["done"], "total": row["total"]},
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def claim(self, worker_pid: int) -> Optional[Dict]:
+        """
+        Marks the oldest queued job as running on this worker and returns it, or None when the queue is empty.
+
+        Queued jobs that have already used up MAX_ATTEMPTS are failed instead of claimed.
+        """
+        now = time.time()
+        with self._lock, immediate_transaction(self._conn):
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND attempts >= ?",
+                (FAILED, self._attempts_error(), now, QUEUED, MAX_ATTEMPTS)
+            )
+            row = self._conn.execute(
+                "SELECT job_id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, worker_pid = ?, attempts = attempts + 1,
+                    started_at = ?, heartbeat_at = ?
+                WHERE job_id = ?
+                """,
+                (RUNNING, worker_pid, now, now, row["job_id"])
+            )
+        return {"job_id": row["job_id"], "kind": row["kind"], "params": json.loads(row["params"])}
+
+    def heartbeat(self, job_id: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def progress(self, job_id: str, done: int, total: Optional[int] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET done = ?, total = COALESCE(?, total), heartbeat_at = ? WHERE job_id = ?",
+                (done, total, time.time(), job_id)
+            )
+
+    def save_item(self, job_id: str, item_key: str, value: Any):
+        """
+        Persists the result of one unit of a job's work, such as one paper's key points.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_items VALUES (?, ?, ?)", (job_id, item_key, json.dumps(value))
+            )
+
+    def items(self, job_id: str, offset: int = 0) -> Dict[str, Any]:
+        """
+        Returns the items saved so far for a job, in the order they were saved, which a
+        resumed job can skip and a client can show before the job is done.
+
+        Args:
+            job_id (str): The job's id.
+            offset (int): Number of items, in saved order, to skip.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_key, value FROM job_items WHERE job_id = ? ORDER BY rowid LIMIT -1 OFFSET ?",
+                (job_id, offset)
+            ).fetchall()
+        return {row["item_key"]: json.loads(row["value"]) for row in rows}
+
+    def complete(self, job_id: str, result: Any):
+        with self._lock, immediate_transaction(self._conn):
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ?, total = COALESCE(total, done) WHERE job_id = ?",
+                (DONE, json.dumps(result), time.time(), job_id)
+            )
+            # The result holds everything the items were kept for
+            self._conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (FAILED, error, time.time(), job_id)
+            )
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER_SECONDS) -> int:
+        """
+        Requeues running jobs whose worker stopped sending heartbeats; they resume from their saved items.
+        Those that have already used up MAX_ATTEMPTS are failed instead.
+        """
+        return self._requeue_or_fail("heartbeat_at < ?", [time.time() - stale_after])
+
+    def requeue_crashed(self, worker_pids: List[int]) -> int:
+        """
+        Requeues the running jobs of workers that died, without waiting for them to go stale.
+
+        Unlike requeue_workers, the attempt counts towards MAX_ATTEMPTS, since the job may be
+        what killed the worker; those that have used up MAX_ATTEMPTS are failed instead.
+        """
+        if not worker_pids:
+            return 0
+        placeholders = ", ".join("?" for _ in worker_pids)
+        return self._requeue_or_fail(f"worker_pid IN ({placeholders})", worker_pids)
+
+    def _requeue_or_fail(self, condition: str, params: List[Any]) -> int:
+        with self._lock, immediate_transaction(self._conn):
+            self._conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?, worker_pid = NULL
+                WHERE status = ? AND attempts >= ? AND {condition}
+                """,
+                (FAILED, self._attempts_error(), time.time(), RUNNING, MAX_ATTEMPTS, *params)
+            )
+            return self._conn.execute(
+                f"UPDATE jobs SET status = ?, worker_pid = NULL WHERE status = ? AND {condition}",
+                (QUEUED, RUNNING, *params)
+            ).rowcount
+
+    def requeue_workers(self, worker_pids: List[int]) -> int:
+        """
+        Requeues the running jobs of workers that were stopped, without waiting for them to go stale.
+
+        A stop is not the job's fault, so the interrupted attempt does not count towards MAX_ATTEMPTS.
+        """
+        if not worker_pids:
+            return 0
+        placeholders = ", ".join("?" for _ in worker_pids)
+        with self._lock:
+            return self._conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, worker_pid = NULL, attempts = attempts - 1
+                WHERE status = ? AND worker_pid IN ({placeholders})
+                """,
+                (QUEUED, RUNNING, *worker_pids)
+            ).rowcount
+
+    @staticmethod
+    def _attempts_error() -> str:
+        return f"The job's worker died or stopped responding on each of its {MAX_ATTEMPTS} attempts."
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({row["status"]: row["count"] for row in rows})
+        return counts
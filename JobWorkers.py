@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from DatabaseAgent import Neo4jDatabase, neo4j_settings_from_env
+from FutureWorksAgent import FutureWorksAgent, RELATED_CONTEXT_PAPERS
+from JobQueue import JobQueue
+from LLMScheduler import scheduler
+from SummarizeFindingsAgent import SummarizeFindings
+
+# Worker processes draining the queue. Their model calls take the same machine-wide LLMSlots
+# as the API's, at batch priority: Ollama still sees at most LLM_CONCURRENCY calls in total,
+# and job calls wait while the API has interactive ones queued
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 10
+# How often the API process checks for worker processes that died
+SUPERVISE_SECONDS = 2.0
+
+def papers_for_year(db: Neo4jDatabase, year: int) -> List[Dict]:
+    papers = db.query_papers_by_year(year)
+    if not papers:
+        raise LookupError("No papers found for the specified year.")
+    return papers
+
+def summarize_findings_job(db: Neo4jDatabase, jobs: JobQueue, job_id: str, params: Dict) -> Dict:
+    # A resumed job gets the digests of groups that already finished from the LLM cache
+    papers = papers_for_year(db, params["year"])
+    jobs.progress(job_id, 0, len(papers))
+    findings_summary = SummarizeFindings(papers).summarize_findings(
+        on_progress=lambda done, total: jobs.progress(job_id, done, total)
+    )
+    return {"findings_summary": findings_summary}
+
+def future_works_from_year_job(db: Neo4jDatabase, jobs: JobQueue, job_id: str, params: Dict) -> Dict:
+    papers = papers_for_year(db, params["year"])
+    jobs.progress(job_id, 0, len(papers))
+    future_works_summary = SummarizeFindings(papers).generate_future_works_from_year(
+        on_progress=lambda done, total: jobs.progress(job_id, done, total)
+    )
+    return {"future_works_summary": future_works_summary}
+
+def extract_key_points_job(db: Neo4jDatabase, jobs: JobQueue, job_id: str, params: Dict) -> Dict:
+    papers = papers_for_year(db, params["year"])
+    saved = jobs.items(job_id)
+    done = len(saved)
+    jobs.progress(job_id, done, len(papers))
+
+    remaining = [paper for paper in papers if paper["paper_id"] not in saved]
+    for key_points in SummarizeFindings(remaining).iter_key_points():
+        saved[key_points["paper_id"]] = key_points
+        jobs.save_item(job_id, key_points["paper_id"], key_points)
+        done += 1
+        jobs.progress(job_id, done)
+
+    return {"key_points": [saved[paper["paper_id"]] for paper in papers]}
+
+def review_paper_job(db: Neo4jDatabase, jobs: JobQueue, job_id: str, params: Dict) -> Dict:
+    papers = papers_for_year(db, params["year"])
+    saved = jobs.items(job_id)
+    done = len(saved)
+    jobs.progress(job_id, done, len(papers))
+
+    agent = FutureWorksAgent(papers)
+    remaining = [index for index, paper in enumerate(papers) if paper["paper_id"] not in saved]
+    missing = [papers[index]["paper_id"] for index in remaining if agent.stored_future_work(index) is None]
+    related = db.related_papers_many(missing, limit=RELATED_CONTEXT_PAPERS) if missing else {}
+    for index in remaining:
+        if papers[index]["paper_id"] in related:
+            papers[index]["related_papers"] = related[papers[index]["paper_id"]]
+
+    for index, future_work in agent.iter_future_works(remaining):
+        saved[papers[index]["paper_id"]] = future_work
+        jobs.save_item(job_id, papers[index]["paper_id"], future_work)
+        done += 1
+        jobs.progress(job_id, done)
+
+    return {"review_paper": agent.compose_review_paper([saved[paper["paper_id"]] for paper in papers])}
+
+# Job kinds accepted by POST /jobs/{kind}
+HANDLERS: Dict[str, Callable[[Neo4jDatabase, JobQueue, str, Dict], Any]] = {
+    "summarize_findings": summarize_findings_job,
+    "generate_future_works_from_year": future_works_from_year_job,
+    "extract_key_points": extract_key_points_job,
+    "create_review_paper": review_paper_job,
+}
+
+def _send_heartbeats(jobs: JobQueue, job_id: str, stop: threading.Event):
+    # A single LLM call can outlast STALE_AFTER_SECONDS, so liveness does not depend on progress
+    while not stop.wait(HEARTBEAT_SECONDS):
+        jobs.heartbeat(job_id)
+
+def run_job(db: Neo4jDatabase, jobs: JobQueue, job: Dict):
+    """
+    Runs one claimed job to completion, recording its result or its error.
+
+    Args:
+        db (Neo4jDatabase): Neo4j database instance.
+        jobs (JobQueue): The queue the job was claimed from.
+        job (Dict): job_id, kind and params, as returned by JobQueue.claim.
+    """
+    job_id = job["job_id"]
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_send_heartbeats, args=(jobs, job_id, stop), daemon=True)
+    heartbeat.start()
+    start = time.perf_counter()
+    try:
+        result = HANDLERS[job["kind"]](db, jobs, job_id, job["params"])
+    except Exception as e:
+        print(f"Job {job_id} ({job['kind']}) failed: {e}")
+        jobs.fail(job_id, f"{type(e).__name__}: {e}")
+    else:
+        jobs.complete(job_id, result)
+        print(f"Job {job_id} ({job['kind']}) finished in {time.perf_counter() - start:.2f}s")
+    finally:
+        stop.set()
+        heartbeat.join()
+
+def run_worker(jobs_path: str):
+    """
+    Entry point of each worker process: claims queued jobs one at a time until terminated.
+
+    Args:
+        jobs_path (str): Path of the JobQueue's SQLite database.
+    """
+    db = Neo4jDatabase(*neo4j_settings_from_env())
+    jobs = JobQueue(jobs_path)
+    pid = os.getpid()
+    try:
+        while True:
+            # Any worker can pick up the jobs of one that crashed
+            jobs.requeue_stale()
+            job = jobs.claim(pid)
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            run_job(db, jobs, job)
+    finally:
+        db.close()
+
+class JobWorkerPool:
+    def __init__(self, jobs: JobQueue, size: int = JOB_WORKERS):
+        """
+        Worker processes that drain the job queue in parallel, each running one job at a time.
+
+        Args:
+            jobs (JobQueue): The queue to drain; workers open their own connection to its file.
+            size (int): Number of worker processes; 0 leaves queued jobs for workers started elsewhere.
+        """
+        self.jobs = jobs
+        self.size = size
+        self._processes: List[multiprocessing.Process] = []
+        self._stop = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    def start(self):
+        self._processes = [self._spawn(index) for index in range(self.size)]
+        self._stop.clear()
+        self._supervisor = threading.Thread(target=self._supervise, name="job-worker-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        # spawn: a forked child would inherit the API's Neo4j driver and executor threads' locks, possibly held
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(target=run_worker, args=(self.jobs.path,), name=f"job-worker-{index}", daemon=True)
+        process.start()
+        return process
+
+    def _supervise(self):
+        # A worker killed by the OOM killer or a crash in native code takes its job down with it.
+        # Without a replacement, a job that kills every worker would leave none to fail it, and
+        # the queue would stop draining while the API kept accepting jobs.
+        while not self._stop.wait(SUPERVISE_SECONDS):
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                print(f"Job worker {process.name} (pid {process.pid}) exited with code {process.exitcode}; replacing it")
+                self.jobs.requeue_crashed([process.pid])
+                if scheduler.slots is not None:
+                    scheduler.slots.release_pids([process.pid])
+                self._processes[index] = self._spawn(index)
+
+    def stop(self):
+        """
+        Terminates the workers and requeues their running jobs, which resume from their saved items on the next start.
+        """
+        # Stop supervising first, so the workers terminated below are not replaced
+        self._stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        pids = [process.pid for process in self._processes]
+        self.jobs.requeue_workers(pids)
+        # Model calls cut off mid-generation would otherwise hold their slots until the lease expires
+        if scheduler.slots is not None:
+            scheduler.slots.release_pids(pids)
+        self._processes = []
+
+if __name__ == "__main__":
+    # Drains the queue alongside an API started with JOB_WORKERS=0, or adds workers to one that was not
+    run_worker(JobQueue().path)
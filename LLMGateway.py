@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, Optional
+from langchain_ollama import OllamaLLM
+from LLMScheduler import INTERACTIVE, scheduler
+from PromptBuilder import context_window
+from SingleFlight import SingleFlight
+from SQLiteStore import connect
+from Tracing import bind, registry, span
+
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+
+# Summing the table on every write is wasteful, so the size budget is checked every N writes
+EVICTION_CHECK_INTERVAL = 50
+
+class ResponseCache:
+    def __init__(self, path: str = CACHE_PATH, ttl_seconds: float = CACHE_TTL_SECONDS, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        SQLite-backed store of LLM responses.
+
+        Entries expire after ttl_seconds, and the least recently used ones are evicted
+        once the stored responses exceed max_bytes.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            ttl_seconds (float): Lifetime of an entry.
+            max_bytes (int): Size budget for the stored responses.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._conn = connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                template TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, template: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, template, response, len(response.encode()), now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        expired = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        self.evictions += expired
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+class LLMGateway:
+    def __init__(self, model: str, cache: Optional[ResponseCache] = None, **options):
+        """
+        Wraps an OllamaLLM and caches its responses by model, options, prompt template and prompt.
+
+        Args:
+            model (str): The Ollama model name.
+            cache (Optional[ResponseCache]): Where responses are cached; None disables caching.
+            **options: Extra OllamaLLM options; they are part of the cache key.
+        """
+        self.model = model
+        self.options = options
+        self.cache = cache
+        self.llm = OllamaLLM(model=model, **options)
+
+    def cache_key(self, template: Optional[str], prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        key_material = json.dumps([self.model, self.options, template, prompt_hash], sort_keys=True)
+        return hashlib.sha256(key_material.encode()).hexdigest()
+
+    def invoke(
+        self,
+        input: str,
+        template: Optional[str] = None,
+        priority: int = INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        Generates a completion, serving it from the cache when possible.
+
+        Cache misses are queued on the shared LLMScheduler, which decides when they reach the model.
+
+        Args:
+            input (str): The rendered prompt.
+            template (Optional[str]): Name and version of the prompt template, e.g. "future_work:v1".
+                Bump the version when the template text changes. Calls without a template are not cached.
+            priority (int): LLMScheduler.INTERACTIVE for a user waiting on this call, BATCH for bulk work.
+            timeout (Optional[float]): Seconds the call may wait in the scheduler's queue before
+                failing with LLMScheduler.DeadlineExceeded. None waits indefinitely.
+
+        Returns:
+            str: The model's response.
+        """
+        # Identical prompts in flight at the same time share one generation
+        key = self.cache_key(template, input)
+        return prompt_flights.do(key, lambda: self._cached_generate(key, input, template, priority, timeout))
+
+    def _cached_generate(
+        self, key: str, input: str, template: Optional[str], priority: int, timeout: Optional[float]
+    ) -> str:
+        if template is None or self.cache is None:
+            return self._generate(input, priority, timeout)
+
+        response = self.cache.get(key)
+        if response is None:
+            response = self._generate(input, priority, timeout)
+            self.cache.put(key, self.model, template, response)
+        return response
+
+    def stream(
+        self,
+        input: str,
+        template: Optional[str] = None,
+        priority: int = INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        """
+        Generates a completion chunk by chunk, as the model produces it.
+
+        A cached response is yielded as a single chunk. A fresh one is only cached once
+        the stream has been fully consumed, so closing the generator early aborts the
+        generation without caching a truncated response.
+
+        The generation holds one of the scheduler's shared model slots until the stream
+        ends, so it counts against LLM_CONCURRENCY like any invoke call.
+
+        Args:
+            input (str): The rendered prompt.
+            template (Optional[str]): Name and version of the prompt template, as for invoke.
+            priority (int): LLMScheduler.INTERACTIVE for a user waiting on this call, BATCH for bulk work.
+            timeout (Optional[float]): Seconds to wait for a model slot before failing with
+                LLMScheduler.DeadlineExceeded. None waits indefinitely.
+
+        Yields:
+            str: The next piece of the model's response.
+        """
+        key = self._cached_key(template, input)
+        if key is not None:
+            response = self.cache.get(key)
+            if response is not None:
+                yield response
+                return
+
+        chunks = []
+        start = time.perf_counter()
+        with scheduler.slot(priority, timeout):
+            for chunk in self.llm.stream(input):
+                if not chunks:
+                    registry.observe("llm_time_to_first_token_seconds", "model", self.model, time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+
+        if key is not None:
+            self.cache.put(key, self.model, template, "".join(chunks))
+
+    async def astream(
+        self,
+        input: str,
+        template: Optional[str] = None,
+        priority: int = INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Async version of stream, for use directly on the event loop.
+
+        Cancelling the consuming task closes the connection to Ollama, which stops the generation.
+        """
+        key = self._cached_key(template, input)
+        if key is not None:
+            # The cache is SQLite behind a lock, which can wait up to its busy timeout; keep it off the event loop
+            response = await asyncio.to_thread(self.cache.get, key)
+            if response is not None:
+                yield response
+                return
+
+        chunks = []
+        start = time.perf_counter()
+        async with scheduler.aslot(priority, timeout):
+            async for chunk in self.llm.astream(input):
+                if not chunks:
+                    registry.observe("llm_time_to_first_token_seconds", "model", self.model, time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, self.model, template, "".join(chunks))
+
+    def _cached_key(self, template: Optional[str], prompt: str) -> Optional[str]:
+        if template is None or self.cache is None:
+            return None
+        return self.cache_key(template, prompt)
+
+    def _generate(self, prompt: str, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> str:
+        with span("llm.generate"):
+            return scheduler.run(bind(lambda: self.llm.invoke(input=prompt)), priority, timeout)
+
+response_cache = ResponseCache()
+prompt_flights = SingleFlight("llm_prompt")
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+def get_llm(model: str = "llama3.1") -> LLMGateway:
+    """
+    Returns the process-wide gateway for a model, creating it on first use.
+    """
+    with _gateways_lock:
+        if model not in _gateways:
+            # Without num_ctx, Ollama uses its small default window and silently drops the start of long prompts
+            _gateways[model] = LLMGateway(model, cache=response_cache, num_ctx=context_window(model))
+        return _gateways[model]
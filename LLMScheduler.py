@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from LLMSlots import LLMSlots
+from Tracing import registry
+
+# Lower runs first: a user waiting on an answer goes ahead of per-paper batch work
+INTERACTIVE = 0
+BATCH = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Match Ollama's OLLAMA_NUM_PARALLEL; more concurrent requests only queue inside Ollama.
+# The limit is machine-wide: the API and every job worker process share these slots
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "2"))
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a prompt is still queued when its deadline passes."""
+
+class _Request:
+    def __init__(self, fn: Callable[[], Any], priority: int, deadline: Optional[float]):
+        self.fn = fn
+        self.priority = priority
+        self.deadline = deadline
+        self.sequence = 0
+        self.enqueued_at = time.monotonic()
+        self.future: Future = Future()
+
+class LLMScheduler:
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, slots: Optional[LLMSlots] = None):
+        """
+        Central queue for model calls from every agent, dispatched by a fixed number of
+        worker threads in priority order, first in first out within a priority.
+
+        With slots, each call also takes one of the slots shared with the other processes
+        on the machine, so their calls are ordered by priority against this process's too.
+
+        Args:
+            concurrency (int): Number of calls this process sends to the model server at the same time.
+            slots (Optional[LLMSlots]): Machine-wide limit shared with other processes.
+        """
+        self.concurrency = concurrency
+        self.slots = slots
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self.running = 0
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, fn: Callable[[], Any], priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Future:
+        """
+        Queues a call.
+
+        Args:
+            fn (Callable[[], Any]): The model call to make.
+            priority (int): INTERACTIVE, BATCH or any other int; lower runs first.
+            timeout (Optional[float]): Seconds the call may wait in the queue before it fails
+                with DeadlineExceeded instead of running. None waits indefinitely.
+
+        Returns:
+            Future: Resolves to fn()'s result.
+        """
+        self._start_workers()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        request = _Request(fn, priority, deadline)
+        request.sequence = next(self._sequence)
+        self._queue.put((priority, request.sequence, request))
+        return request.future
+
+    def run(self, fn: Callable[[], Any], priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Any:
+        """
+        Queues a call and blocks until it has run, returning its result.
+        """
+        return self.submit(fn, priority, timeout).result()
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._workers) < self.concurrency:
+                worker = threading.Thread(target=self._work, name=f"llm-scheduler-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        # The shared slot this thread holds; kept between calls while more are queued here
+        lease: Optional[str] = None
+        while True:
+            try:
+                _, _, request = self._queue.get_nowait()
+            except queue.Empty:
+                if lease is not None:
+                    self.slots.release(lease)
+                    lease = None
+                _, _, request = self._queue.get()
+
+            if request.future.cancelled():
+                continue
+            expired = request.deadline is not None and time.monotonic() > request.deadline
+            if self.slots is not None and not expired:
+                if lease is not None and not self.slots.renew(lease, request.priority):
+                    lease = None
+                if lease is None:
+                    lease = self.slots.acquire(
+                        request.priority, request.deadline, give_up=lambda: self._queued_ahead(request.priority)
+                    )
+                expired = request.deadline is not None and time.monotonic() > request.deadline
+                if lease is None and not expired:
+                    # A more urgent call was queued here while this one waited for a slot; it goes first
+                    self._queue.put((request.priority, request.sequence, request))
+                    continue
+
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            waited = time.monotonic() - request.enqueued_at
+            priority_name = PRIORITY_NAMES.get(request.priority, str(request.priority))
+            registry.observe("llm_queue_wait_seconds", "priority", priority_name, waited)
+
+            if expired:
+                with self._lock:
+                    self.expired += 1
+                request.future.set_exception(
+                    DeadlineExceeded(f"LLM request waited {waited:.1f}s in the queue, past its deadline")
+                )
+                continue
+
+            with self._lock:
+                self.running += 1
+            try:
+                result = request.fn()
+            except BaseException as e:
+                with self._lock:
+                    self.failed += 1
+                request.future.set_exception(e)
+            else:
+                with self._lock:
+                    self.completed += 1
+                request.future.set_result(result)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Holds one of the shared slots around a model call made outside the queue, such as a
+        streamed generation, whose chunks go straight to the caller instead of through a Future.
+
+        Args:
+            priority (int): INTERACTIVE, BATCH or any other int; lower is served first.
+            timeout (Optional[float]): Seconds to wait for a slot before raising DeadlineExceeded.
+        """
+        if self.slots is None:
+            yield
+            return
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        lease = self.slots.acquire(priority, deadline)
+        self._held(lease, priority, start)
+        try:
+            yield
+        finally:
+            self.slots.release(lease)
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Async version of slot, for use directly on the event loop.
+        """
+        if self.slots is None:
+            yield
+            return
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        cancelled = threading.Event()
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.slots.acquire, priority, deadline, cancelled.is_set))
+        try:
+            lease = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The waiting thread stops at its next poll; a slot it took in the meantime is handed back
+            cancelled.set()
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+        self._held(lease, priority, start)
+        try:
+            yield
+        finally:
+            self.slots.release(lease)
+
+    def _held(self, lease: Optional[str], priority: int, start: float):
+        waited = time.monotonic() - start
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        registry.observe("llm_queue_wait_seconds", "priority", priority_name, waited)
+        if lease is None:
+            with self._lock:
+                self.expired += 1
+            raise DeadlineExceeded(f"LLM request waited {waited:.1f}s for a model slot, past its deadline")
+
+    def _release_acquired(self, acquiring: "asyncio.Future"):
+        if not acquiring.cancelled() and acquiring.exception() is None and acquiring.result() is not None:
+            self.slots.release(acquiring.result())
+
+    def _queued_ahead(self, priority: int) -> bool:
+        with self._queue.mutex:
+            return bool(self._queue.queue) and self._queue.queue[0][0] < priority
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {
+                "concurrency": self.concurrency,
+                "queue_depth": self._queue.qsize(),
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "expired": self.expired,
+            }
+        if self.slots is not None:
+            stats.update({f"shared_slots_{name}": value for name, value in self.slots.stats().items()})
+        return stats
+
+scheduler = LLMScheduler(slots=LLMSlots(LLM_CONCURRENCY))
@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from SQLiteStore import connect, immediate_transaction
+
+SLOTS_PATH = os.environ.get("LLM_SLOTS_PATH", ".llm_slots.sqlite3")
+# A slot still held after this long is handed out again, even if its holder's pid is alive:
+# the pid may have been reused, or the holder may be stuck
+LEASE_SECONDS = float(os.environ.get("LLM_SLOT_LEASE_SECONDS", 600))
+POLL_SECONDS = 0.05
+# Waiters refresh their row on every poll, so one this old belongs to a process that died waiting
+WAITER_STALE_SECONDS = 5.0
+
+def pid_alive(pid: Optional[int]) -> bool:
+    if pid is None or os.name == "nt":
+        # On Windows signal 0 is CTRL_C_EVENT, so there liveness is left to the lease expiry
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+class LLMSlots:
+    def __init__(self, capacity: int, path: str = SLOTS_PATH):
+        """
+        Machine-wide limit on concurrent model calls, shared through SQLite by the API,
+        the job worker processes and any offline script, so together they never send
+        Ollama more than capacity calls at once.
+
+        Callers waiting for a slot are recorded with their priority. A slot is not given
+        to a caller while a higher-priority one (a lower number) is waiting in any
+        process, and callers of equal priority are served first come, first served, so
+        batch work in the job workers backs off while the API has interactive prompts queued.
+
+        Args:
+            capacity (int): Number of calls sent to the model server at the same time.
+            path (str): Path of the SQLite database file.
+        """
+        self.capacity = capacity
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        # Leases only matter while the processes holding them run, so they need not survive a power loss
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS slots (
+                slot INTEGER PRIMARY KEY,
+                lease TEXT,
+                holder_pid INTEGER,
+                priority INTEGER,
+                acquired_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS waiters (
+                waiter TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                since REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+        with self._lock, immediate_transaction(self._conn):
+            self._conn.executemany("INSERT OR IGNORE INTO slots (slot) VALUES (?)", [(slot,) for slot in range(capacity)])
+
+    def acquire(
+        self,
+        priority: int,
+        deadline: Optional[float] = None,
+        give_up: Optional[Callable[[], bool]] = None
+    ) -> Optional[str]:
+        """
+        Waits for a free slot.
+
+        Args:
+            priority (int): The call's scheduling priority; lower is served first.
+            deadline (Optional[float]): time.monotonic() value after which to stop waiting.
+            give_up (Optional[Callable[[], bool]]): Checked between polls; stop waiting once it returns True.
+
+        Returns:
+            Optional[str]: The lease to pass to renew and release, or None if the deadline passed
+                or give_up returned True first.
+        """
+        waiter = f"{os.getpid()}:{threading.get_ident()}"
+        since = time.time()
+        try:
+            while True:
+                lease = self._try_acquire(waiter, priority, since)
+                if lease is not None:
+                    return lease
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                if give_up is not None and give_up():
+                    return None
+                time.sleep(POLL_SECONDS)
+        finally:
+            with self._lock:
+                self._conn.execute("DELETE FROM waiters WHERE waiter = ?", (waiter,))
+
+    def _try_acquire(self, waiter: str, priority: int, since: float) -> Optional[str]:
+        now = time.time()
+        with self._lock, immediate_transaction(self._conn):
+            self._conn.execute(
+                "INSERT OR REPLACE INTO waiters VALUES (?, ?, ?, ?)", (waiter, priority, since, now)
+            )
+            if self._waiter_ahead(waiter, priority, since, now):
+                return None
+
+            free = next((slot for slot, held in self._holders(now) if not held), None)
+            if free is None:
+                return None
+
+            lease = uuid.uuid4().hex
+            self._conn.execute(
+                "UPDATE slots SET lease = ?, holder_pid = ?, priority = ?, acquired_at = ? WHERE slot = ?",
+                (lease, os.getpid(), priority, now, free)
+            )
+            return lease
+
+    def _holders(self, now: float) -> List[Tuple[int, bool]]:
+        # A slot is free when it was released, its lease expired, or the process holding it
+        # is gone, e.g. a worker killed by the OOM killer mid-generation
+        rows = self._conn.execute(
+            "SELECT slot, lease, holder_pid, acquired_at FROM slots WHERE slot < ? ORDER BY slot", (self.capacity,)
+        ).fetchall()
+        return [
+            (slot, lease is not None and acquired_at >= now - LEASE_SECONDS and pid_alive(holder_pid))
+            for slot, lease, holder_pid, acquired_at in rows
+        ]
+
+    def _waiter_ahead(self, waiter: str, priority: int, since: float, now: float) -> bool:
+        return self._conn.execute(
+            """
+            SELECT 1 FROM waiters
+            WHERE waiter <> ? AND updated_at > ? AND (priority < ? OR (priority = ? AND since < ?))
+            LIMIT 1
+            """,
+            (waiter, now - WAITER_STALE_SECONDS, priority, priority, since)
+        ).fetchone() is not None
+
+    def renew(self, lease: str, priority: int) -> bool:
+        """
+        Keeps a held slot for the caller's next call, unless a caller of the same or higher priority is waiting.
+
+        This lets a process with a backlog of interactive calls keep its slots, instead of
+        racing lower-priority waiters for them between two calls.
+
+        Returns:
+            bool: Whether the slot is still held; if not, it was released and acquire must be called.
+        """
+        now = time.time()
+        with self._lock, immediate_transaction(self._conn):
+            ahead = self._conn.execute(
+                "SELECT 1 FROM waiters WHERE updated_at > ? AND priority <= ? LIMIT 1",
+                (now - WAITER_STALE_SECONDS, priority)
+            ).fetchone()
+            if ahead is not None:
+                self._conn.execute("UPDATE slots SET lease = NULL, holder_pid = NULL WHERE lease = ?", (lease,))
+                return False
+            return self._conn.execute(
+                "UPDATE slots SET priority = ?, acquired_at = ? WHERE lease = ?", (priority, now, lease)
+            ).rowcount == 1
+
+    def release(self, lease: str):
+        with self._lock:
+            self._conn.execute("UPDATE slots SET lease = NULL, holder_pid = NULL WHERE lease = ?", (lease,))
+
+    def release_pids(self, pids: List[int]) -> int:
+        """
+        Frees the slots held by processes that were stopped, without waiting for their leases to expire.
+        """
+        if not pids:
+            return 0
+        placeholders = ", ".join("?" for _ in pids)
+        with self._lock:
+            return self._conn.execute(
+                f"UPDATE slots SET lease = NULL, holder_pid = NULL WHERE holder_pid IN ({placeholders})", pids
+            ).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        with self._lock:
+            in_use = sum(held for _, held in self._holders(now))
+            waiting = self._conn.execute(
+                "SELECT COUNT(*) FROM waiters WHERE updated_at > ?", (now - WAITER_STALE_SECONDS,)
+            ).fetchone()[0]
+        return {"capacity": self.capacity, "in_use": in_use, "waiting": waiting}
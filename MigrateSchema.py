@@ -0,0 +1,19 @@
+from DatabaseAgent import Neo4jDatabase
+from SemanticIndex import SemanticIndex
+
+neo4j_uri = "neo4j://localhost:7687"
+neo4j_user = "neo4j"
+neo4j_password = "password"
+
+db = Neo4jDatabase(neo4j_uri, neo4j_user, neo4j_password)
+
+try:
+    db.ensure_schema()
+    db.backfill_paper_years()
+    db.backfill_paper_graph()
+    # Papers stored before the search index existed; ones already indexed are skipped
+    indexed = SemanticIndex().add(db.iter_paper_texts())
+    print(f"Added {indexed} papers to the search index.")
+    print("Schema is up to date.")
+finally:
+    db.close()
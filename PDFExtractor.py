@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import fitz
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PAGES_PER_TASK = 8
+
+# Below this many pages, shipping the PDF to worker processes costs more than it saves
+MIN_PARALLEL_PAGES = 24
+
+# The document a worker process opened last, by the path of its temporary copy
+_worker_document: Optional[Tuple[str, fitz.Document]] = None
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process. Each worker reads and parses a document once and keeps it
+    # open for the document's later ranges, instead of receiving and parsing it per range.
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != pdf_path:
+        if _worker_document is not None:
+            _worker_document[1].close()
+        # Read into memory rather than opening the file, so the parent can delete it while it is in use
+        with open(pdf_path, "rb") as file:
+            _worker_document = (pdf_path, fitz.open(stream=file.read(), filetype="pdf"))
+    pdf_doc = _worker_document[1]
+    return [pdf_doc[page_number].get_text() for page_number in range(start, stop)]
+
+class PDFExtractor:
+    def __init__(
+        self,
+        max_workers: int = PDF_WORKERS,
+        pages_per_task: int = PAGES_PER_TASK,
+        min_parallel_pages: int = MIN_PARALLEL_PAGES
+    ):
+        """
+        Extracts the text of PDFs held in memory, splitting long documents into page
+        ranges that are extracted in a pool of worker processes, outside this process's GIL.
+
+        Args:
+            max_workers (int): Number of worker processes; 1 extracts every PDF in the calling thread.
+            pages_per_task (int): Pages in each range handed to a worker.
+            min_parallel_pages (int): Shorter PDFs are extracted in the calling thread.
+        """
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.min_parallel_pages = min_parallel_pages
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def extract_pages(self, pdf_bytes: bytes, max_chars: Optional[int] = None) -> List[str]:
+        """
+        Extracts the text of each page, in order.
+
+        Args:
+            pdf_bytes (bytes): The PDF file's content.
+            max_chars (Optional[int]): Stop once the pages extracted so far hold this many
+                characters; the remaining pages are skipped. None extracts every page.
+
+        Returns:
+            List[str]: The text of each extracted page.
+        """
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+            page_count = pdf_doc.page_count
+            if self.max_workers <= 1 or page_count < self.min_parallel_pages:
+                pages = []
+                chars = 0
+                for page in pdf_doc:
+                    pages.append(page.get_text())
+                    chars += len(pages[-1])
+                    if max_chars is not None and chars >= max_chars:
+                        break
+                return pages
+
+        return self._extract_parallel(pdf_bytes, page_count, max_chars)
+
+    def _extract_parallel(self, pdf_bytes: bytes, page_count: int, max_chars: Optional[int]) -> List[str]:
+        ranges = [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        pool = self._get_pool()
+
+        # Workers are handed the path of one temporary copy rather than the bytes, which
+        # would otherwise be pickled into every range's task
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as file:
+            file.write(pdf_bytes)
+
+        # Keep only a window of ranges in flight, so stopping early skips the rest of the document
+        pending: List[Future] = []
+        next_range = 0
+        pages: List[str] = []
+        chars = 0
+        try:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < self.max_workers * 2:
+                    pending.append(pool.submit(_extract_range, pdf_path, *ranges[next_range]))
+                    next_range += 1
+
+                for text in pending.pop(0).result():
+                    pages.append(text)
+                    chars += len(text)
+                    if max_chars is not None and chars >= max_chars:
+                        return pages
+            return pages
+        finally:
+            for future in pending:
+                future.cancel()
+            os.unlink(pdf_path)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: the server process has threads, and forking those is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
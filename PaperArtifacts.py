@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+import time
+from DatabaseAgent import Neo4jDatabase
+from FutureWorksAgent import FutureWorksAgent, FUTURE_WORK_TEMPLATE, RELATED_CONTEXT_PAPERS
+from LLMScheduler import BATCH
+from SummarizeFindingsAgent import SummarizeFindings, KEY_POINTS_TEMPLATE
+
+# Stored artifacts produced by any other template version are treated as stale
+ARTIFACT_VERSIONS = {
+    "key_points": KEY_POINTS_TEMPLATE,
+    "future_work": FUTURE_WORK_TEMPLATE,
+}
+ENRICH_WORKERS = 4
+
+def generate_artifacts(paper: Dict) -> Dict:
+    """
+    Generates the key points and future work suggestions for one paper.
+
+    Args:
+        paper (Dict): Paper details, including any artifacts already stored and its related_papers.
+
+    Returns:
+        Dict: paper_id plus each artifact and the template version that produced it.
+    """
+    key_points = SummarizeFindings.key_points_for_paper(paper)
+    future_work = FutureWorksAgent([paper]).generate_future_work(0, priority=BATCH)
+    return {
+        "paper_id": paper["paper_id"],
+        "key_points": key_points["key_points"],
+        "key_points_version": KEY_POINTS_TEMPLATE,
+        "future_work": future_work,
+        "future_work_version": FUTURE_WORK_TEMPLATE,
+    }
+
+def enrich_papers(db: Neo4jDatabase, batch_size: int = 100, max_workers: int = ENRICH_WORKERS) -> int:
+    """
+    Precomputes artifacts for every stored paper that is missing them or has stale ones.
+
+    Meant to run offline after store_papers_in_database, so requests can read the
+    stored artifacts instead of waiting on the LLM.
+
+    Args:
+        db (Neo4jDatabase): Neo4j database instance.
+        batch_size (int): Number of papers generated and written per round.
+        max_workers (int): Number of papers generated concurrently.
+
+    Returns:
+        int: The number of papers enriched.
+    """
+    enriched = 0
+    after = ""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            papers = db.get_papers_missing_artifacts(ARTIFACT_VERSIONS, after=after, limit=batch_size)
+            if not papers:
+                break
+            after = papers[-1]["paper_id"]
+
+            start = time.perf_counter()
+            related = db.related_papers_many([paper["paper_id"] for paper in papers], limit=RELATED_CONTEXT_PAPERS)
+            for paper in papers:
+                paper["related_papers"] = related[paper["paper_id"]]
+            rows = list(pool.map(generate_artifacts, papers))
+            db.store_paper_artifacts(rows)
+            enriched += len(rows)
+            print(f"Enriched {len(rows)} papers in {time.perf_counter() - start:.2f}s ({enriched} so far)")
+
+    print(f"Enriched {enriched} papers with precomputed artifacts.")
+    return enriched
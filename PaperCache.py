@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+CACHE_DIR = os.environ.get("PAPER_CACHE_DIR", ".paper_cache")
+CACHE_MAX_BYTES = int(os.environ.get("PAPER_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+class PaperCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        On-disk cache for downloaded PDFs and their extracted per-page text.
+
+        Entries are evicted least-recently-used first once the directory grows past max_bytes.
+        Reads bump a file's mtime, which is what the eviction order is based on.
+
+        Args:
+            directory (str): Directory holding the cached files.
+            max_bytes (int): Total size budget for the cache directory.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(identifier: str) -> str:
+        """
+        Builds a cache key from a paper_id or, when there is none, the PDF URL.
+        """
+        return hashlib.sha256(identifier.encode()).hexdigest()
+
+    def get_pdf(self, key: str) -> Optional[bytes]:
+        return self._read(self._path(key, "pdf"))
+
+    def put_pdf(self, key: str, data: bytes):
+        self._write(self._path(key, "pdf"), data)
+
+    def get_pages(self, key: str) -> Optional[List[str]]:
+        data = self._read(self._path(key, "pages.json"))
+        if data is None:
+            return None
+        return json.loads(data)
+
+    def put_pages(self, key: str, pages: List[str]):
+        self._write(self._path(key, "pages.json"), json.dumps(pages).encode())
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never written, or evicted by another worker between lookup and read.
+            return None
+        return data
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temp file in the same directory and rename it into place, so
+        # concurrent readers only ever see a missing file or a complete one.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
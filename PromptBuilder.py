@@ -0,0 +1,172 @@
+import hashlib
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Context windows the gateway asks Ollama for; prompts beyond num_ctx are silently truncated
+MODEL_CONTEXT_TOKENS = {
+    "llama3.1": 8192,
+    "llama3.2": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+CONTEXT_TOKENS_OVERRIDE = os.environ.get("OLLAMA_NUM_CTX")
+# Part of the context window left free for the model's response
+RESPONSE_TOKENS = 1024
+
+# cl100k is not Llama's tokenizer, but counts within a few percent of it on English prose.
+# tiktoken is optional; without it, counts are estimated from the number of words
+TOKENIZER_ENCODING = os.environ.get("TOKENIZER_ENCODING", "cl100k_base")
+TOKEN_COUNT_CACHE_SIZE = 100000
+
+WORD_PATTERN = re.compile(r"\S+")
+TRAILING_WORD_PATTERN = re.compile(r"\S*$")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+_token_counts: "OrderedDict[bytes, int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+def context_window(model: str) -> int:
+    if CONTEXT_TOKENS_OVERRIDE:
+        return int(CONTEXT_TOKENS_OVERRIDE)
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+def prompt_budget(model: str) -> int:
+    """
+    Tokens a prompt for the model may use, leaving room for the response.
+    """
+    return context_window(model) - RESPONSE_TOKENS
+
+def get_encoding():
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding_failed:
+        return None
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                # tiktoken downloads the encoding on first use, which fails offline
+                warnings.warn(f"Falling back to estimated token counts: {e}", RuntimeWarning)
+                _encoding_failed = True
+    return _encoding
+
+def _estimate_tokens(text: str) -> int:
+    # English prose averages about 1.3 tokens per word
+    return int(len(text.split()) * 1.3) + 1
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in text with tiktoken when it is installed, estimating otherwise.
+
+    Counts are memoized by content, so the same paper summary is only tokenized once
+    however many prompts it ends up in.
+    """
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+        if count is not None:
+            _token_counts.move_to_end(key)
+            return count
+
+    encoding = get_encoding()
+    count = len(encoding.encode(text, disallowed_special=())) if encoding is not None else _estimate_tokens(text)
+
+    with _token_counts_lock:
+        _token_counts[key] = count
+        if len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shortens text to at most about max_tokens tokens, cutting at a word boundary.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = get_encoding()
+    if encoding is not None:
+        prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+        # Token boundaries fall inside words; drop the partial word unless it is the only one
+        if not text[len(prefix):len(prefix) + 1].isspace():
+            partial = TRAILING_WORD_PATTERN.search(prefix)
+            if partial.start() > 0:
+                prefix = prefix[:partial.start()].rstrip()
+        return prefix
+
+    words = int(max_tokens / 1.3)
+    for index, match in enumerate(WORD_PATTERN.finditer(text)):
+        if index + 1 >= words:
+            return text[:match.end()]
+    return text
+
+class PromptBuilder:
+    def __init__(self, model: str = "llama3.1", budget: Optional[int] = None):
+        """
+        Assembles a prompt from sections so that it fits the model's token budget.
+
+        Sections are kept in the order they were added. When the prompt is over budget,
+        truncatable sections are shortened starting with the lowest priority, while
+        fixed sections such as the instructions and the question are always kept whole.
+        If the fixed sections alone exceed the budget, build() warns and returns an
+        over-budget prompt, which Ollama will truncate.
+
+        Args:
+            model (str): The Ollama model the prompt is for; it sets the default budget.
+            budget (Optional[int]): Token budget overriding the model's.
+        """
+        self.budget = budget if budget is not None else prompt_budget(model)
+        self._sections: List[Tuple[str, int, bool]] = []
+
+    def add(self, text: str, priority: int = 0, truncatable: bool = True) -> "PromptBuilder":
+        """
+        Appends a section.
+
+        Args:
+            text (str): The section's text, including any separators.
+            priority (int): Higher priorities are truncated last.
+            truncatable (bool): Whether the section may be shortened to fit the budget.
+
+        Returns:
+            PromptBuilder: This builder, so calls can be chained.
+        """
+        if text:
+            self._sections.append((text, priority, truncatable))
+        return self
+
+    def build(self) -> str:
+        texts = [text for text, _, _ in self._sections]
+        counts = [count_tokens(text) for text in texts]
+        excess = sum(counts) - self.budget
+
+        by_priority = sorted(range(len(texts)), key=lambda index: self._sections[index][1])
+        for index in by_priority:
+            if excess <= 0:
+                break
+            if not self._sections[index][2]:
+                continue
+            keep = max(counts[index] - excess, 0)
+            # Keep the section's trailing separator so the next section still starts on its own line
+            body = texts[index].rstrip()
+            texts[index] = truncate_to_tokens(body, keep) + texts[index][len(body):] if keep else ""
+            excess -= counts[index] - keep
+
+        if excess > 0:
+            warnings.warn(
+                f"Prompt is {excess} tokens over its {self.budget} token budget after truncation; "
+                "its fixed sections alone do not fit",
+                RuntimeWarning
+            )
+        return "".join(texts)
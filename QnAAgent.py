@@ -1,48 +1,95 @@
-from langchain_ollama import OllamaLLM
-from typing import List, Dict
+from typing import List, Dict, Optional
+import os
 import requests
-import fitz 
+from PaperCache import PaperCache
+from PDFExtractor import PDFExtractor
+from PromptBuilder import PromptBuilder
+from RetrievalIndex import PaperIndexCache
+from SingleFlight import SingleFlight
+from LLMGateway import get_llm
+from LLMScheduler import INTERACTIVE
+from Tracing import span, traced
 
-qa_model = OllamaLLM(model="llama3.1")
+qa_model = get_llm("llama3.1")
+paper_cache = PaperCache()
+paper_indexes = PaperIndexCache()
+pdf_flights = SingleFlight("pdf_text")
+pdf_extractor = PDFExtractor()
+
+# Text beyond this is never indexed, so extraction stops there; long appendices are skipped
+PDF_MAX_CHARS = int(os.environ.get("PDF_MAX_CHARS", 400000))
+
+# Fail fast rather than keep a user waiting behind a long queue of batch prompts
+QUEUE_TIMEOUT_SECONDS = float(os.environ.get("QNA_QUEUE_TIMEOUT_SECONDS", 120))
+
+# How much of the paper's full text goes into the prompt
+RETRIEVAL_TOP_K = 6
+RETRIEVAL_TOKEN_BUDGET = 1200
 
 class QnAAgent:
     def __init__(self, papers: List[Dict]):
         self.papers = papers
 
-    def download_and_extract_text(self, url: str) -> str:
+    def download_and_extract_text(self, url: str, paper_id: Optional[str] = None) -> str:
         """
         Downloads the PDF from the given URL and extracts text.
+
+        Both the PDF and its extracted pages are cached on disk, so repeated
+        questions about the same paper skip the download and the extraction.
+        Concurrent calls for the same paper share one download and extraction.
         
         Args:
             url (str): The URL of the PDF to download.
+            paper_id (Optional[str]): The paper's unique ID, used as the cache key when given.
 
         Returns:
             str: The extracted text content of the PDF.
         """
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        with open("temp_paper.pdf", "wb") as file:
-            file.write(response.content)
-        
-        with fitz.open("temp_paper.pdf") as pdf_doc:
-            text = ""
-            for page in pdf_doc:
-                text += page.get_text()
-        
-        return text
+        key = PaperCache.make_key(paper_id or url)
+        return pdf_flights.do(key, lambda: self._load_text(key, url))
+
+    def _load_text(self, key: str, url: str) -> str:
+        pages = paper_cache.get_pages(key)
+        if pages is None:
+            pdf_bytes = paper_cache.get_pdf(key)
+            if pdf_bytes is None:
+                with span("pdf.download"):
+                    response = requests.get(url)
+                    response.raise_for_status()
+                pdf_bytes = response.content
+                paper_cache.put_pdf(key, pdf_bytes)
+
+            with span("pdf.extract"):
+                pages = pdf_extractor.extract_pages(pdf_bytes, max_chars=PDF_MAX_CHARS)
+            paper_cache.put_pages(key, pages)
+
+        return "".join(pages)
 
     def answer_text_question(self, question: str, paper_index: int) -> str:
+        return qa_model.invoke(
+            input=self.text_question_prompt(question, paper_index),
+            priority=INTERACTIVE,
+            timeout=QUEUE_TIMEOUT_SECONDS
+        )
+
+    def text_question_prompt(self, question: str, paper_index: int) -> str:
         paper = self.papers[paper_index]
-        context = f"Title: {paper['title']}\nSummary: {paper['summary']}\n"
-        
+        # The retrieved passages give way first, then the summary; the question is always kept
+        prompt = PromptBuilder(qa_model.model)
+        prompt.add(f"Title: {paper['title']}\n", truncatable=False)
+        prompt.add(f"Summary: {paper['summary']}\n", priority=2)
+
         if "url" in paper and paper["url"].endswith(".pdf"):
-            full_text = self.download_and_extract_text(paper["url"])
-            context += f"\nContent:\n{full_text[:2000]}"
+            index = paper_indexes.get_or_build(
+                paper.get("paper_id") or paper["url"],
+                lambda: self.download_and_extract_text(paper["url"], paper.get("paper_id"))
+            )
+            with span("retrieval.search"):
+                passages = index.top_chunks(question, k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET)
+            prompt.add("\nContent:\n" + "\n...\n".join(passages), priority=1)
 
-        input_prompt = f"{context}\n\nQuestion: {question}\nAnswer:"
-        answer = qa_model.invoke(input=input_prompt)
-        return answer
+        prompt.add(f"\n\nQuestion: {question}\nAnswer:", truncatable=False)
+        return prompt.build()
 
 
     def handle_image_question(self, question: str, paper_index: int) -> str:
@@ -56,17 +103,47 @@ class QnAAgent:
         Returns:
             str: Placeholder answer for visual content questions.
         """
+        # need to use the llama3.2 vision model model for an answer related to visual content
+        return qa_model.invoke(
+            input=self.image_question_prompt(question, paper_index),
+            priority=INTERACTIVE,
+            timeout=QUEUE_TIMEOUT_SECONDS
+        )
+
+    def image_question_prompt(self, question: str, paper_index: int) -> str:
         paper = self.papers[paper_index]
-        input_prompt = (
-            f"Title: {paper['title']}\nSummary: {paper['summary']}\n\n"
+        prompt = PromptBuilder(qa_model.model)
+        prompt.add(f"Title: {paper['title']}\n", truncatable=False)
+        prompt.add(f"Summary: {paper['summary']}\n\n")
+        prompt.add(
             f"Question: {question}\n"
-            "Answer with details if this paper contains images, charts, or figures relevant to the question."
+            "Answer with details if this paper contains images, charts, or figures relevant to the question.",
+            truncatable=False
         )
+        return prompt.build()
 
-        # need to use the llama3.2 vision model model for an answer related to visual content
-        answer = qa_model.invoke(input=input_prompt)
-        return answer
+    @staticmethod
+    def is_image_question(question: str) -> bool:
+        return any(keyword in question.lower() for keyword in ["image", "chart", "graph", "figure"])
+
+    def question_prompt(self, question: str, paper_index: int) -> str:
+        """
+        Builds the prompt answer_question would send, without generating the answer.
+
+        Used by the streaming endpoint, which generates the answer itself with qa_model.astream.
+
+        Args:
+            question (str): The question to answer.
+            paper_index (int): The index of the paper in the list to reference.
+
+        Returns:
+            str: The rendered prompt.
+        """
+        if self.is_image_question(question):
+            return self.image_question_prompt(question, paper_index)
+        return self.text_question_prompt(question, paper_index)
 
+    @traced("qna.answer_question")
     def answer_question(self, question: str, paper_index: int) -> str:
         """
         Determines whether a question is text or image-based and provides an answer.
@@ -78,7 +155,7 @@ class QnAAgent:
         Returns:
             str: The answer to the question.
         """
-        if any(keyword in question.lower() for keyword in ["image", "chart", "graph", "figure"]):
+        if self.is_image_question(question):
             return self.handle_image_question(question, paper_index)
         else:
             return self.answer_text_question(question, paper_index)
\ No newline at end of file
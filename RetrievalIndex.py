@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from PromptBuilder import count_tokens
+from SingleFlight import SingleFlight
+from Tracing import span
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Embeddings are opt-in: set this to a local sentence-transformers model name to enable them.
+EMBEDDING_MODEL = os.environ.get("RETRIEVAL_EMBEDDING_MODEL")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def chunk_text(text: str, chunk_words: int = 200, overlap_words: int = 50) -> List[str]:
+    """
+    Splits text into overlapping chunks of roughly chunk_words words.
+
+    Args:
+        text (str): The full text to split.
+        chunk_words (int): Number of words per chunk.
+        overlap_words (int): Number of words shared by consecutive chunks.
+
+    Returns:
+        List[str]: The chunks, in document order.
+    """
+    words = text.split()
+    step = max(chunk_words - overlap_words, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+def get_embedder():
+    global _embedder
+    if EMBEDDING_MODEL is None or SentenceTransformer is None:
+        return None
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _embedder
+
+class BM25Index:
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        BM25 over a small set of chunks, with the per-term weights precomputed.
+
+        The weights are stored as postings, one (chunk, weight) list per term laid end to
+        end, since a chunk only contains a small share of the paper's vocabulary.
+
+        Args:
+            chunks (List[str]): The documents to index.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+        """
+        self.vocab: Dict[str, int] = {}
+        self.size = len(chunks)
+        rows, terms, counts = [], [], []
+        doc_len = np.zeros(len(chunks), dtype=np.float32)
+        for row, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_len[row] = len(tokens)
+            for token, count in Counter(tokens).items():
+                rows.append(row)
+                terms.append(self.vocab.setdefault(token, len(self.vocab)))
+                counts.append(count)
+
+        rows = np.array(rows, dtype=np.int32)
+        terms = np.array(terms, dtype=np.int32)
+        tf = np.array(counts, dtype=np.float32)
+
+        avg_len = max(float(doc_len.mean()), 1.0) if len(chunks) else 1.0
+        df = np.bincount(terms, minlength=len(self.vocab))
+        idf = np.log1p((len(chunks) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len[rows] / avg_len)
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        order = np.argsort(terms, kind="stable")
+        self.rows = rows[order]
+        self.weights = weights[order].astype(np.float32)
+        # The postings of term t are rows[offsets[t]:offsets[t + 1]]
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.offsets[1:])
+
+    def score(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, stop = self.offsets[term], self.offsets[term + 1]
+            np.add.at(scores, self.rows[start:stop], self.weights[start:stop])
+        return scores
+
+class PaperIndex:
+    def __init__(self, text: str, chunk_words: int = 200, overlap_words: int = 50):
+        """
+        Retrieval index over one paper's full text.
+
+        Args:
+            text (str): The paper's extracted text.
+            chunk_words (int): Number of words per chunk.
+            overlap_words (int): Number of words shared by consecutive chunks.
+        """
+        self.chunks = chunk_text(text, chunk_words, overlap_words)
+        self.chunk_tokens = np.array([count_tokens(chunk) for chunk in self.chunks], dtype=np.int32)
+        self.bm25 = BM25Index(self.chunks)
+
+        self.embeddings: Optional[np.ndarray] = None
+        embedder = get_embedder()
+        if embedder is not None and self.chunks:
+            self.embeddings = embedder.encode(self.chunks, normalize_embeddings=True).astype(np.float32)
+
+    def scores(self, question: str) -> np.ndarray:
+        scores = self.bm25.score(question)
+        if scores.max(initial=0) > 0:
+            scores = scores / scores.max()
+
+        if self.embeddings is not None:
+            query = get_embedder().encode([question], normalize_embeddings=True)[0].astype(np.float32)
+            scores = 0.5 * scores + 0.5 * (self.embeddings @ query)
+        return scores
+
+    def top_chunks(self, question: str, k: int = 6, token_budget: int = 1200) -> List[str]:
+        """
+        Selects the best matching chunks for a question without exceeding a token budget.
+
+        Args:
+            question (str): The question being answered.
+            k (int): Maximum number of chunks to return.
+            token_budget (int): Maximum total estimated tokens across the returned chunks.
+
+        Returns:
+            List[str]: The selected chunks, in document order.
+        """
+        if not self.chunks:
+            return []
+
+        selected = []
+        used = 0
+        for position in np.argsort(-self.scores(question), kind="stable"):
+            if used + self.chunk_tokens[position] > token_budget:
+                continue
+            selected.append(position)
+            used += self.chunk_tokens[position]
+            if len(selected) >= k:
+                break
+
+        return [self.chunks[position] for position in sorted(selected)]
+
+class PaperIndexCache:
+    def __init__(self, max_entries: int = 32):
+        """
+        In-memory LRU of built PaperIndex objects, keyed by paper_id.
+
+        Args:
+            max_entries (int): Number of paper indexes kept before the least recently used is dropped.
+        """
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, PaperIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._builds = SingleFlight("paper_index")
+
+    def get_or_build(self, key: str, load_text: Callable[[], str]) -> PaperIndex:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        # Build outside the lock so one slow paper doesn't block lookups for the others,
+        # and only once when several requests ask for the same paper at the same time.
+        return self._builds.do(key, lambda: self._build(key, load_text))
+
+    def _build(self, key: str, load_text: Callable[[], str]) -> PaperIndex:
+        text = load_text()
+        with span("retrieval.build_index"):
+            index = PaperIndex(text)
+
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
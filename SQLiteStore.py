@@ -0,0 +1,37 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Opens a SQLite database shared by several threads and processes.
+
+    Statements autocommit unless run inside immediate_transaction, and WAL mode lets
+    readers in other processes carry on while one of them writes.
+
+    Args:
+        path (str): Path of the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: The connection; callers serialize its use with their own lock.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+@contextmanager
+def immediate_transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    Runs the enclosed statements as one transaction, rolled back if they raise.
+
+    BEGIN IMMEDIATE takes the write lock up front rather than at the first write, so two
+    processes that read a row and then update it, e.g. to claim a job or a model slot,
+    never both act on the same read.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
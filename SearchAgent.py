@@ -1,85 +1,427 @@
 import arxiv
-from datetime import datetime, timedelta
-from typing import List, Dict
+import functools
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Dict, NamedTuple, Optional, Tuple
 from DatabaseAgent import Neo4jDatabase
+from SemanticIndex import SemanticIndex
 
-def search_papers(topic: str, max_results: int = 500) -> List[Dict]:
+PAGE_SIZE = 100
+HARVEST_WORKERS = 4
+# Pages buffered between the harvester and its consumer; bounds memory during ingest
+HARVEST_QUEUE_SIZE = 8
+PAGE_RETRIES = 3
+# arXiv asks API clients to leave about three seconds between requests
+REQUEST_INTERVAL_SECONDS = 3.0
+# arXiv lists some papers days after their published date, so incremental runs start this far
+# before the stored watermark; papers fetched again are skipped by their content hash
+WATERMARK_LOOKBACK = timedelta(days=3)
+
+class RateLimiter:
+    def __init__(self, interval: float):
+        """
+        Spaces calls to wait() at least interval seconds apart, across all threads.
+
+        Args:
+            interval (float): Minimum number of seconds between two calls.
+        """
+        self.interval = interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+class HarvestCheckpoint:
+    def __init__(self, path: Optional[str], topic: str, since: datetime, max_results: int):
+        """
+        Tracks how far each date window has been harvested, persisted as JSON when a path is given.
+
+        A checkpoint written for the same topic is resumed, including the start date it was
+        created with; one for a different topic is ignored. The file is removed once every
+        window is done or max_results papers have been fetched.
+
+        Args:
+            path (Optional[str]): Where the checkpoint is stored; None keeps it in memory only.
+            topic (str): The topic being harvested.
+            since (datetime): Start of the harvested date range, unless resuming.
+            max_results (int): Number of papers after which the harvest is complete.
+        """
+        self.path = path
+        self.topic = topic
+        self.since = since
+        self.max_results = max_results
+        self.windows: Dict[str, Dict] = {}
+        self.fetched = 0
+        self.latest: Optional[str] = None
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as file:
+                state = json.load(file)
+            if state.get("topic") == topic:
+                self.since = datetime.fromisoformat(state["since"])
+                self.windows = state["windows"]
+                self.fetched = state["fetched"]
+                self.latest = state.get("latest")
+                print(f"Resuming harvest from {path}: {self.fetched} papers already fetched.")
+
+        self.ranges = month_windows(self.since, datetime.now(timezone.utc))
+
+    def window(self, key: str) -> Dict:
+        with self._lock:
+            return dict(self.windows.get(key, {"offset": 0, "done": False}))
+
+    def advance(self, key: str, offset: int, done: bool, fetched: int, latest: Optional[str] = None):
+        with self._lock:
+            self.windows[key] = {"offset": offset, "done": done}
+            self.fetched += fetched
+            if latest is not None and (self.latest is None or latest > self.latest):
+                self.latest = latest
+            if self.complete():
+                self._remove()
+            else:
+                self._save()
+
+    def complete(self) -> bool:
+        if self.fetched >= self.max_results:
+            return True
+        return all(self.windows.get(window_key(window), {}).get("done") for window in self.ranges)
+
+    def watermark(self) -> Optional[str]:
+        """
+        Returns the date before which every paper has been harvested, as an ISO string.
+
+        That is the start of the earliest unfinished window, or the newest harvested
+        published_date once all windows are done.
+        """
+        with self._lock:
+            for window in self.ranges:
+                if not self.windows.get(window_key(window), {}).get("done"):
+                    start = datetime.strptime(window[0], "%Y%m%d%H%M").replace(tzinfo=timezone.utc)
+                    return start.isoformat() if start > self.since else None
+            return self.latest
+
+    def _remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self):
+        if not self.path:
+            return
+        state = {
+            "topic": self.topic,
+            "since": self.since.isoformat(),
+            "fetched": self.fetched,
+            "latest": self.latest,
+            "windows": self.windows
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+
+def incremental_since(watermark: str, lookback: timedelta = WATERMARK_LOOKBACK) -> datetime:
     """
-    Searches for research papers on Arxiv related to a given topic, subdividing by year if necessary.
+    Returns where an incremental harvest should start for a stored watermark.
 
     Args:
-        topic (str): The research topic to search for.
-        max_results (int): Maximum number of papers to fetch.
+        watermark (str): ISO date before which every paper on the topic was stored.
+        lookback (timedelta): How far before the watermark to start, to catch papers listed late.
+
+    Returns:
+        datetime: The since argument for harvest_pages.
+    """
+    return datetime.fromisoformat(watermark) - lookback
+
+def month_windows(start: datetime, end: datetime) -> List[Tuple[str, str]]:
+    """
+    Splits the range from start up to end into calendar months, the first one starting at start itself.
+
+    Returns:
+        List[Tuple[str, str]]: (start, end) pairs in arXiv's YYYYMMDDHHMM submittedDate format.
+    """
+    windows = []
+    window_start = start.strftime("%Y%m%d%H%M")
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        window_end = f"{next_year}{next_month:02d}010000"
+        windows.append((window_start, window_end))
+        window_start = window_end
+        year, month = next_year, next_month
+    return windows
+
+def window_key(window: Tuple[str, str]) -> str:
+    return f"{window[0]}-{window[1]}"
+
+def paper_from_result(result) -> Dict:
+    return {
+        "title": result.title,
+        "authors": [author.name for author in result.authors],
+        "published_date": result.published,
+        "summary": result.summary,
+        "url": result.entry_id,
+        "links": [link.href for link in result.links if link.href != result.entry_id]
+    }
+
+def fetch_page(client, query: str, offset: int, page_size: int = PAGE_SIZE) -> List:
+    """
+    Fetches one page of results for a query, starting at offset.
+
+    Args:
+        client: An arxiv.Client, or any object with the same results(search, offset) method.
+        query (str): The arXiv query string.
+        offset (int): Index of the first result to fetch.
+        page_size (int): Number of results to fetch.
 
     Returns:
-        List[Dict]: A list of dictionaries containing paper details.
+        List: The arxiv.Result objects on the page; fewer than page_size means the query is exhausted.
     """
-    # Define the years to search across
-    start_year = 2019
-    end_year = datetime.now().year
-    client = arxiv.Client()
-    papers = []
-    paper_ids = set()  
+    search = arxiv.Search(
+        query=query,
+        max_results=offset + page_size,
+        sort_by=arxiv.SortCriterion.SubmittedDate,
+        sort_order=arxiv.SortOrder.Ascending
+    )
+    return list(client.results(search, offset=offset))
 
-    for year in range(start_year, end_year + 1):
-        search_query = f"{topic} AND submittedDate:[{year}0101 TO {year}1231]"
-        batch_size = 100  
+class HarvestPage(NamedTuple):
+    papers: List[Dict]
+    # Advances the checkpoint past this page; call it once the papers are stored
+    commit: Callable[[], None]
 
-        print(f"Searching for papers in the year {year}...")
+def harvest_pages(
+    topic: str,
+    max_results: int,
+    checkpoint_path: Optional[str] = None,
+    start_year: int = 2019,
+    since: Optional[datetime] = None,
+    on_watermark: Optional[Callable[[str], None]] = None,
+    client=None,
+    max_workers: int = HARVEST_WORKERS,
+    rate_limiter: Optional[RateLimiter] = None,
+    queue_size: int = HARVEST_QUEUE_SIZE
+) -> Iterator[HarvestPage]:
+    """
+    Harvests papers on a topic from arXiv, one calendar month per window, windows in parallel.
+
+    Windows are fetched on background threads that hand pages over through a bounded
+    queue, so the harvest runs ahead of the consumer by at most queue_size pages. A window's
+    checkpoint only advances when the consumer commits its page, which makes a crashed
+    run started again with the same checkpoint_path resume after the last stored page.
+    A window that keeps failing is left at its last good offset for the next run.
+
+    Args:
+        topic (str): The research topic to search for.
+        max_results (int): Maximum number of papers to fetch across all windows.
+        checkpoint_path (Optional[str]): JSON file recording progress per window.
+        start_year (int): First year to harvest, when since is not given.
+        since (Optional[datetime]): Only harvest papers submitted from this moment on.
+        on_watermark (Optional[Callable[[str], None]]): Called after each commit that moves the
+            watermark, the date before which every paper has now been stored.
+        client: arxiv.Client shared by every window; a local fake can be passed in tests.
+            By default each worker thread gets its own client.
+        max_workers (int): Number of windows fetched concurrently.
+        rate_limiter (Optional[RateLimiter]): Shared limit on arXiv requests.
+        queue_size (int): Number of fetched pages buffered ahead of the consumer.
+
+    Yields:
+        HarvestPage: The new papers on each page, with the commit for its checkpoint.
+    """
+    rate_limiter = rate_limiter or RateLimiter(REQUEST_INTERVAL_SECONDS)
+    since = since or datetime(start_year, 1, 1, tzinfo=timezone.utc)
+    checkpoint = HarvestCheckpoint(checkpoint_path, topic, since, max_results)
+    windows = checkpoint.ranges
+    watermark = checkpoint.watermark()
+
+    pages: "queue.Queue[Optional[HarvestPage]]" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    seen_ids = set()
+    fetched = checkpoint.fetched
+    lock = threading.Lock()
+    clients = threading.local()
 
-        while len(papers) < max_results:
+    def thread_client():
+        # A requests.Session is not safe to share between threads. The client itself never
+        # retries, so every request, including retries after a 503, waits on rate_limiter
+        if client is not None:
+            return client
+        if not hasattr(clients, "client"):
+            clients.client = arxiv.Client(page_size=PAGE_SIZE, delay_seconds=0, num_retries=0)
+        return clients.client
+
+    def put(page: Optional[HarvestPage]) -> bool:
+        # Blocks while the queue is full, giving up once the consumer has gone away
+        while not stop.is_set():
             try:
-                search = arxiv.Search(
-                    query=search_query,
-                    max_results=batch_size,
-                    sort_by=arxiv.SortCriterion.SubmittedDate
-                )
+                pages.put(page, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-                results = list(client.results(search))
-                if not results:
-                    print(f"No more results available from Arxiv for the year {year}.")
-                    break  
+    def harvest_window(window: Tuple[str, str]):
+        nonlocal fetched
+        key = window_key(window)
+        query = f"{topic} AND submittedDate:[{window[0]} TO {window[1]}]"
+        state = checkpoint.window(key)
+        offset = state["offset"]
+        done = state["done"]
 
-                new_papers_found = False
+        while not done and fetched < max_results and not stop.is_set():
+            for attempt in range(1, PAGE_RETRIES + 1):
+                rate_limiter.wait()
+                try:
+                    results = fetch_page(thread_client(), query, offset)
+                    break
+                except Exception as e:
+                    print(f"Error fetching {key} at offset {offset} (attempt {attempt}/{PAGE_RETRIES}): {e}")
+            else:
+                return
 
+            with lock:
+                papers = []
                 for result in results:
-                    if result.entry_id in paper_ids:
-                        continue
-
-                    paper_info = {
-                        "title": result.title,
-                        "authors": [author.name for author in result.authors],
-                        "published_date": result.published,
-                        "summary": result.summary,
-                        "url": result.entry_id,
-                        "links": [link.href for link in result.links if link.href != result.entry_id]
-                    }
-                    papers.append(paper_info)
-                    paper_ids.add(paper_info["url"])  
-                    new_papers_found = True
+                    if result.entry_id not in seen_ids:
+                        seen_ids.add(result.entry_id)
+                        papers.append(paper_from_result(result))
+                papers = papers[:max(max_results - fetched, 0)]
+                fetched += len(papers)
 
-                    if len(papers) >= max_results:
-                        break
+            offset += len(results)
+            done = len(results) < PAGE_SIZE
+            latest = max((paper["published_date"].isoformat() for paper in papers), default=None)
+            commit = functools.partial(commit_page, key, offset, done, len(papers), latest)
+            if not put(HarvestPage(papers, commit)):
+                return
 
-                if not new_papers_found:
-                    print(f"No new unique papers found in the last batch for the year {year}.")
-                    break  
+    def commit_page(key: str, offset: int, done: bool, count: int, latest: Optional[str]):
+        nonlocal watermark
+        checkpoint.advance(key, offset, done, count, latest)
+        if on_watermark is not None:
+            new_watermark = checkpoint.watermark()
+            if new_watermark is not None and new_watermark != watermark:
+                watermark = new_watermark
+                on_watermark(watermark)
 
-            except Exception as e:
-                print(f"Error fetching results: {e}")
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                list(pool.map(harvest_window, windows))
+        finally:
+            put(None)
+
+    print(f"Harvesting '{topic}' across {len(windows)} monthly windows...")
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
                 break
+            yield page
+    finally:
+        stop.set()
+
+def search_papers(topic: str, max_results: int = 500, checkpoint_path: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Searches for research papers on Arxiv related to a given topic, subdividing by month.
+
+    Papers are yielded as they are fetched rather than collected into a list first.
+
+    Args:
+        topic (str): The research topic to search for.
+        max_results (int): Maximum number of papers to fetch.
+        checkpoint_path (Optional[str]): JSON file used to resume an interrupted search.
 
-    print(f"Fetched {len(papers)} unique papers on topic '{topic}'.")
-    return papers, list(paper_ids)
+    Yields:
+        Dict: Details of each paper.
+    """
+    count = 0
+    for page in harvest_pages(topic, max_results, checkpoint_path=checkpoint_path):
+        yield from page.papers
+        page.commit()
+        count += len(page.papers)
+    print(f"Fetched {count} unique papers on topic '{topic}'.")
 
-def store_papers_in_database(papers: List[Dict], db: Neo4jDatabase):
+def store_papers_in_database(papers: Iterable[Dict], db: Neo4jDatabase, batch_size: int = 500):
     """
     Stores all retrieved papers in the Neo4j database.
 
     Args:
-        papers (List[Dict]): List of paper details.
+        papers (Iterable[Dict]): Paper details; a generator is consumed batch by batch.
+        db (Neo4jDatabase): Neo4j database instance.
+        batch_size (int): Number of papers written per transaction.
+    """
+    stored = db.store_papers_bulk(papers, batch_size=batch_size)
+    print(f"Stored {stored} papers in the database.")
+
+def store_pages_in_database(
+    pages: Iterable[HarvestPage],
+    db: Neo4jDatabase,
+    batch_size: int = 500,
+    flush_seconds: float = 5.0,
+    search_index: Optional[SemanticIndex] = None
+) -> int:
+    """
+    Stores harvested pages as they arrive, committing each page's checkpoint once it is written.
+
+    Papers are buffered up to batch_size, or for at most flush_seconds, so the first
+    papers reach Neo4j shortly after the harvest starts and memory stays bounded.
+
+    Args:
+        pages (Iterable[HarvestPage]): Pages from harvest_pages.
         db (Neo4jDatabase): Neo4j database instance.
+        batch_size (int): Number of papers written per transaction.
+        flush_seconds (float): Longest time papers wait in the buffer.
+        search_index (Optional[SemanticIndex]): Also appends the stored papers to this search index.
+
+    Returns:
+        int: The number of papers stored.
     """
-    for paper in papers:
-        db.store_paper(paper)
-    print(f"Stored {len(papers)} papers in the database.")
\ No newline at end of file
+    stored = 0
+    buffer = []
+    commits = []
+    last_flush = time.monotonic()
+
+    def flush():
+        nonlocal stored, last_flush
+        if buffer:
+            stored += db.store_papers_bulk(buffer, batch_size=batch_size)
+            if search_index is not None:
+                search_index.add([
+                    {
+                        "paper_id": db.make_paper_id(paper["url"]),
+                        "title": paper["title"],
+                        "summary": paper["summary"],
+                        "year": paper["published_date"].year,
+                    }
+                    for paper in buffer
+                ])
+        for commit in commits:
+            commit()
+        buffer.clear()
+        commits.clear()
+        last_flush = time.monotonic()
+
+    for page in pages:
+        buffer.extend(page.papers)
+        commits.append(page.commit)
+        if len(buffer) >= batch_size or time.monotonic() - last_flush >= flush_seconds:
+            flush()
+    flush()
+
+    print(f"Stored {stored} papers in the database.")
+    return stored
\ No newline at end of file
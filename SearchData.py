@@ -1,5 +1,7 @@
 from DatabaseAgent import Neo4jDatabase
-from SearchAgent import search_papers, store_papers_in_database
+from SearchAgent import harvest_pages, incremental_since, store_pages_in_database
+from PaperArtifacts import enrich_papers
+from SemanticIndex import SemanticIndex
 
 neo4j_uri = "neo4j://localhost:7687" 
 neo4j_user = "neo4j"  
@@ -7,13 +9,31 @@ neo4j_password = "password"
 
 topic = "Long-Context Large Language Models (LLMs)"
 max_results = 10000 
+# Progress is saved here, so rerunning after a crash resumes instead of starting over
+checkpoint_path = "harvest_checkpoint.json"
+# Incremental runs only fetch papers newer than the topic's stored watermark, less a few days' lookback
+full_refresh = False
 
 db = Neo4jDatabase(neo4j_uri, neo4j_user, neo4j_password)
 
 try:
-    papers, paper_ids = search_papers(topic, max_results)
-    store_papers_in_database(papers, db)
-    print(f"Successfully stored {len(papers)} papers on the topic '{topic}' in the database.")
+    db.ensure_schema()
+    # Pages flow from the harvester into Neo4j through a bounded queue, so memory
+    # stays flat however large max_results is
+    watermark = None if full_refresh else db.get_ingest_watermark(topic)
+    if watermark:
+        print(f"Fetching papers on '{topic}' published since {watermark}.")
+
+    pages = harvest_pages(
+        topic,
+        max_results,
+        checkpoint_path=checkpoint_path,
+        since=incremental_since(watermark) if watermark else None,
+        on_watermark=lambda new_watermark: db.set_ingest_watermark(topic, new_watermark)
+    )
+    stored = store_pages_in_database(pages, db, search_index=SemanticIndex())
+    print(f"Successfully stored {stored} papers on the topic '{topic}' in the database.")
+    enrich_papers(db)
 finally:
 
     db.close()
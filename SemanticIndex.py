@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from RetrievalIndex import EMBEDDING_MODEL, get_embedder, tokenize
+
+INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", ".search_index")
+# Buckets of the hashed TF-IDF vectors used when no embedding model is configured
+HASH_DIM = int(os.environ.get("SEARCH_HASH_DIM", 2048))
+# Rows converted to float32 and scored at a time, which bounds a query's scratch memory
+SCORE_BLOCK_ROWS = 32768
+ADD_BATCH_SIZE = 1000
+
+def hashed_counts(text: str, dim: int) -> Counter:
+    # crc32 rather than hash(): the buckets have to be the same in every process
+    return Counter(zlib.crc32(token.encode()) % dim for token in tokenize(text))
+
+def content_hash(paper: Dict) -> str:
+    return hashlib.sha256(f"{paper['title']}\n{paper['summary']}".encode()).hexdigest()[:16]
+
+class SemanticIndex:
+    def __init__(self, directory: str = INDEX_DIR):
+        """
+        Search index over every stored paper's title and summary, kept on disk as one
+        float16 vector per paper in a memory-mapped file shared by all server workers.
+
+        Vectors come from the sentence-transformers model in RETRIEVAL_EMBEDDING_MODEL
+        when one is configured, and are hashed TF-IDF vectors otherwise. The document
+        frequencies are stored, and IDF is applied at query time, so appending papers
+        never requires rewriting the existing vectors. An index keeps the backend it was
+        created with; delete the directory to rebuild it with another one.
+
+        Args:
+            directory (str): Directory holding the index files.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded_meta: Optional[Dict] = None
+        self._vectors: Optional[np.memmap] = None
+        self._papers: List[Dict] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._years = np.zeros(0, dtype=np.int32)
+        self._df: Optional[np.ndarray] = None
+        # Writer state: the meta this instance last wrote, and the content hash of every indexed paper
+        self._written_meta: Optional[Dict] = None
+        self._hashes: Dict[str, str] = {}
+
+    @property
+    def backend(self) -> str:
+        return f"embedding:{EMBEDDING_MODEL}" if get_embedder() is not None else "hashed-tfidf"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            with open(self._path("meta.json")) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: Dict):
+        # Replaced atomically, and only after the data it describes is on disk: readers
+        # ignore any vectors or sidecar lines past the counts it records
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(meta, file)
+            os.replace(tmp_path, self._path("meta.json"))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _load(self) -> Optional[Dict]:
+        """
+        Maps the index files, again only when another process has appended to them since the last load.
+        """
+        meta = self._read_meta()
+        with self._lock:
+            if meta is None or meta == self._loaded_meta:
+                return self._loaded_meta
+
+            count, dim = meta["count"], meta["dim"]
+            self._vectors = (
+                np.memmap(self._path("vectors.f16"), dtype=np.float16, mode="r", shape=(count, dim))
+                if count else None
+            )
+            with open(self._path("papers.jsonl"), "rb") as file:
+                lines = file.read(meta["papers_bytes"]).splitlines()
+            self._papers = [json.loads(line) for line in lines[:count]]
+
+            # A paper whose title or summary changed was appended again; only its newest row is searched
+            newest = {paper["paper_id"]: row for row, paper in enumerate(self._papers)}
+            self._live = np.zeros(count, dtype=bool)
+            self._live[list(newest.values())] = True
+            self._years = np.array([paper.get("year") or 0 for paper in self._papers], dtype=np.int32)
+            self._df = np.load(self._path("df.npy")) if meta["backend"] == "hashed-tfidf" else None
+            self._loaded_meta = meta
+            return meta
+
+    def _embed(self, texts: List[str], backend: str, dim: int) -> np.ndarray:
+        if backend != "hashed-tfidf":
+            return get_embedder().encode(texts, normalize_embeddings=True).astype(np.float16)
+
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for bucket, count in hashed_counts(text, dim).items():
+                vectors[row, bucket] = np.log1p(count)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype(np.float16)
+
+    def add(self, papers: Iterable[Dict], batch_size: int = ADD_BATCH_SIZE) -> int:
+        """
+        Appends papers that are new, or whose title or summary changed, to the index.
+
+        Only one process should add to an index at a time; any number may search it meanwhile.
+
+        Args:
+            papers (Iterable[Dict]): Papers with paper_id, title, summary and, optionally, year.
+            batch_size (int): Number of papers embedded and appended at a time.
+
+        Returns:
+            int: The number of papers appended.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        added = 0
+        batch = []
+        for paper in papers:
+            batch.append(paper)
+            if len(batch) >= batch_size:
+                added += self._append(batch)
+                batch = []
+        if batch:
+            added += self._append(batch)
+        return added
+
+    def _append(self, papers: List[Dict]) -> int:
+        meta = self._read_meta()
+        if meta is not None and meta != self._written_meta:
+            # First write from this instance: learn what is indexed already
+            with open(self._path("papers.jsonl"), "rb") as file:
+                lines = file.read(meta["papers_bytes"]).splitlines()[:meta["count"]]
+            self._hashes = {entry["paper_id"]: entry["hash"] for entry in map(json.loads, lines)}
+
+        if meta is None:
+            backend = self.backend
+            dim = HASH_DIM if backend == "hashed-tfidf" else get_embedder().get_sentence_embedding_dimension()
+            meta = {"backend": backend, "dim": dim, "count": 0, "papers_bytes": 0}
+            if backend == "hashed-tfidf":
+                np.save(self._path("df.npy"), np.zeros(dim, dtype=np.int64))
+        elif meta["backend"] != self.backend:
+            raise ValueError(
+                f"The index in {self.directory} was built with {meta['backend']}, not {self.backend}; "
+                "delete it to rebuild it."
+            )
+
+        seen = {}
+        for paper in papers:
+            digest = content_hash(paper)
+            if self._hashes.get(paper["paper_id"]) != digest:
+                seen[paper["paper_id"]] = (paper, digest)
+        if not seen:
+            return 0
+
+        new_papers = [paper for paper, _ in seen.values()]
+        texts = [f"{paper['title']}. {paper['summary']}" for paper in new_papers]
+        vectors = self._embed(texts, meta["backend"], meta["dim"])
+        lines = b"".join(
+            json.dumps({
+                "paper_id": paper["paper_id"],
+                "title": paper["title"],
+                "year": paper.get("year"),
+                "hash": digest,
+            }).encode() + b"\n"
+            for paper, digest in seen.values()
+        )
+
+        # Drop anything a crashed writer appended past the last recorded meta before appending
+        vectors_bytes = meta["count"] * meta["dim"] * 2
+        for name, size, data in (
+            ("vectors.f16", vectors_bytes, vectors.tobytes()),
+            ("papers.jsonl", meta["papers_bytes"], lines),
+        ):
+            with open(self._path(name), "ab") as file:
+                file.truncate(size)
+                file.write(data)
+
+        if meta["backend"] == "hashed-tfidf":
+            df = np.load(self._path("df.npy"))
+            df += (vectors > 0).sum(axis=0)
+            np.save(self._path("df.npy"), df)
+
+        self._written_meta = {
+            **meta,
+            "count": meta["count"] + len(new_papers),
+            "papers_bytes": meta["papers_bytes"] + len(lines),
+        }
+        self._write_meta(self._written_meta)
+        self._hashes.update({paper_id: digest for paper_id, (_, digest) in seen.items()})
+        return len(new_papers)
+
+    def search(self, query: str, k: int = 10, year: Optional[int] = None) -> List[Dict]:
+        """
+        Finds the papers whose title and summary best match a free-text query.
+
+        Args:
+            query (str): The search text.
+            k (int): Maximum number of papers to return.
+            year (Optional[int]): Only return papers published in this year.
+
+        Returns:
+            List[Dict]: paper_id, title, year and score of each match, best first.
+        """
+        meta = self._load()
+        if meta is None or not meta["count"]:
+            return []
+
+        with self._lock:
+            vectors, papers, live, years, df = self._vectors, self._papers, self._live, self._years, self._df
+
+        if meta["backend"] == "hashed-tfidf":
+            counts = hashed_counts(query, meta["dim"])
+            if not counts:
+                return []
+            columns = np.array(sorted(counts), dtype=np.int64)
+            documents = int(live.sum())
+            idf = np.log((documents + 1) / (df[columns] + 1)) + 1
+            weights = (np.log1p([counts[column] for column in columns]) * idf).astype(np.float32)
+        else:
+            columns = None
+            weights = get_embedder().encode([query], normalize_embeddings=True)[0].astype(np.float32)
+
+        scores = np.empty(len(papers), dtype=np.float32)
+        for start in range(0, len(papers), SCORE_BLOCK_ROWS):
+            block = vectors[start:start + SCORE_BLOCK_ROWS]
+            if columns is not None:
+                block = block[:, columns]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weights
+
+        candidates = live if year is None else live & (years == year)
+        scores[~candidates] = -np.inf
+        k = min(k, int(candidates.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "paper_id": papers[row]["paper_id"],
+                "title": papers[row]["title"],
+                "year": papers[row]["year"],
+                "score": float(scores[row]),
+            }
+            for row in top
+            if scores[row] > 0 or meta["backend"] != "hashed-tfidf"
+        ]
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Every live group, so their counters can be exposed together on /metrics
+_groups: "weakref.WeakSet" = weakref.WeakSet()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    def __init__(self, name: str):
+        """
+        Coalesces identical concurrent calls made from threads: while a call for a key is
+        in flight, other callers with the same key wait for it and share its result
+        (or its exception) instead of repeating the work.
+
+        Nothing is cached; the next call after the in-flight one finishes runs again.
+
+        Args:
+            name (str): Name of the group in the metrics, e.g. "pdf_text".
+        """
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        _groups.add(self)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn() unless a call with the same key is already in flight, in which case
+        it waits for that call and returns its result.
+
+        Args:
+            key (Hashable): Identifies the operation and its inputs.
+            fn (Callable[[], Any]): The work to do.
+
+        Returns:
+            Any: What fn() returned, for this caller or the one it waited on.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
+
+class AsyncSingleFlight:
+    def __init__(self, name: str):
+        """
+        The asyncio counterpart of SingleFlight, for coroutines on one event loop.
+
+        The shared work runs in its own task. A caller that is cancelled, such as a
+        request whose client disconnected, stops waiting without cancelling the work
+        the other callers are waiting on.
+
+        Args:
+            name (str): Name of the group in the metrics, e.g. "papers_by_year".
+        """
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        _groups.add(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits fn() unless a call with the same key is already in flight, in which case
+        it awaits that call's result instead.
+
+        Args:
+            key (Hashable): Identifies the operation and its inputs.
+            fn (Callable[[], Awaitable[Any]]): Returns the coroutine doing the work.
+
+        Returns:
+            Any: The result of the shared call.
+        """
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved when every caller was cancelled before it was raised
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "in_flight": len(self._tasks),
+        }
+
+def stats() -> Dict[str, int]:
+    """
+    Counters of every group, flattened into name_counter keys for the metrics registry.
+    Groups sharing a name, such as one per cache instance, are summed.
+    """
+    flattened: Dict[str, int] = {}
+    for group in list(_groups):
+        for counter, value in group.stats().items():
+            name = f"{group.name}_{counter}"
+            flattened[name] = flattened.get(name, 0) + value
+    return flattened
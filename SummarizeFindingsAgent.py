@@ -1,70 +1,236 @@
-from typing import List, Dict
-from langchain_ollama import OllamaLLM
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from LLMGateway import get_llm
+from LLMScheduler import BATCH
+from PromptBuilder import PromptBuilder, count_tokens, prompt_budget, truncate_to_tokens
+from Tracing import bind, traced
 
-summary_model = OllamaLLM(model="llama3.1")
+summary_model = get_llm("llama3.1")
+
+# Prompt template versions; bump one when its wording changes to invalidate cached responses
+FINDINGS_TEMPLATE = "year_findings:v1"
+YEAR_FUTURE_WORKS_TEMPLATE = "year_future_works:v1"
+DIGEST_TEMPLATE = "year_digest:v1"
+KEY_POINTS_TEMPLATE = "key_points:v1"
+
+# Token budget for the summaries placed in one prompt, leaving room for the instructions;
+# larger years are map-reduced
+INSTRUCTION_TOKENS = 256
+CONTEXT_TOKEN_BUDGET = prompt_budget(summary_model.model) - INSTRUCTION_TOKENS
+MAP_WORKERS = 4
+KEY_POINTS_WORKERS = 4
+MAX_REDUCE_LEVELS = 8
 
 class SummarizeFindings:
-    def __init__(self, papers: List[Dict]):
+    def __init__(self, papers: List[Dict], context_tokens: int = CONTEXT_TOKEN_BUDGET, max_workers: int = MAP_WORKERS):
         """
         Initializes the SummarizeFindingsAgent with a list of papers.
 
         Args:
             papers (List[Dict]): List of dictionaries containing paper details.
+            context_tokens (int): Token budget for the summaries placed in a single prompt.
+            max_workers (int): Number of map-stage groups summarized concurrently.
         """
         self.papers = papers
+        self.context_tokens = context_tokens
+        self.max_workers = max_workers
 
-    def summarize_findings(self) -> str:
+    @traced("summarize.summarize_findings")
+    def summarize_findings(self, on_progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Summarizes the findings of all papers in a specific timeframe.
 
+        Args:
+            on_progress (Optional[Callable[[int, int], None]]): Called with the number of papers
+                digested so far and the total, as the map stage goes.
+
         Returns:
             str: A consolidated summary of the findings.
         """
-        combined_summaries = "\n\n".join(paper["summary"] for paper in self.papers)
+        combined_summaries = self._condense([paper["summary"] for paper in self.papers], on_progress)
 
-        prompt = (
-            f"Summaries of papers published:\n\n{combined_summaries}\n\n"
+        prompt = self._summaries_prompt(
+            combined_summaries,
             "Provide a high-level summary highlighting the main findings across these papers."
         )
 
-        overall_summary = summary_model.invoke(input=prompt)
+        overall_summary = summary_model.invoke(input=prompt, template=FINDINGS_TEMPLATE, priority=BATCH)
         return overall_summary
 
-    def generate_future_works_from_year(self) -> str:
+    @traced("summarize.generate_future_works_from_year")
+    def generate_future_works_from_year(self, on_progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Generates future work suggestions for the year based on all paper summaries.
 
+        Args:
+            on_progress (Optional[Callable[[int, int], None]]): Called with the number of papers
+                digested so far and the total, as the map stage goes.
+
         Returns:
             str: Suggested future work directions for all papers in the specified year.
         """
-        combined_summaries = "\n\n".join(paper["summary"] for paper in self.papers)
+        combined_summaries = self._condense([paper["summary"] for paper in self.papers], on_progress)
 
-        prompt = (
-            f"Summaries of papers published:\n\n{combined_summaries}\n\n"
+        prompt = self._summaries_prompt(
+            combined_summaries,
             "Based on the above summaries, suggest potential improvements, unexplored areas, "
             "and future research directions across these studies."
         )
-        
-        future_work_suggestions = summary_model.invoke(input=prompt)
+
+        future_work_suggestions = summary_model.invoke(input=prompt, template=YEAR_FUTURE_WORKS_TEMPLATE, priority=BATCH)
         return future_work_suggestions
 
-    def extract_key_points(self) -> List[Dict[str, str]]:
+    def _condense(self, texts: List[str], on_progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        Joins texts for a single prompt, map-reducing them first if they don't fit.
+
+        Texts are packed into groups that fit the budget, each group is condensed into a
+        digest concurrently, and the digests are packed again until everything fits.
+
+        Args:
+            texts (List[str]): The texts to combine.
+            on_progress (Optional[Callable[[int, int], None]]): Called with the number of the
+                original texts digested so far and their total. Only the first level is
+                reported; the later ones are a small fraction of the work.
+
+        Returns:
+            str: Combined text that fits within the context budget.
+        """
+        total = len(texts)
+        for level in range(MAX_REDUCE_LEVELS):
+            if len(texts) <= 1 or sum(count_tokens(text) for text in texts) <= self.context_tokens:
+                break
+            groups = self._pack(texts)
+            digests: List[Optional[str]] = [None] * len(groups)
+            digested = 0
+            map_group = bind(self._map_group)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(map_group, "\n\n".join(group)): index for index, group in enumerate(groups)}
+                for future in as_completed(futures):
+                    digests[futures[future]] = future.result()
+                    digested += len(groups[futures[future]])
+                    if on_progress is not None and level == 0:
+                        on_progress(digested, total)
+            texts = digests
+
+        if on_progress is not None:
+            on_progress(total, total)
+        return "\n\n".join(texts)
+
+    def _pack(self, texts: List[str]) -> List[List[str]]:
+        groups = []
+        current = []
+        current_tokens = 0
+        for text in texts:
+            # A single text over the budget would overflow its group's prompt on its own
+            text = truncate_to_tokens(text, self.context_tokens)
+            tokens = count_tokens(text)
+            if current and current_tokens + tokens > self.context_tokens:
+                groups.append(current)
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _map_group(group: str) -> str:
+        # Digests are cached by the gateway, so findings and future works for the
+        # same year only pay for the map stage once. A year can need dozens of them,
+        # so they queue behind interactive questions.
+        prompt = SummarizeFindings._summaries_prompt(
+            group,
+            "Condense these summaries into a short digest that keeps every main finding, "
+            "method and open problem they mention."
+        )
+        return summary_model.invoke(input=prompt, template=DIGEST_TEMPLATE, priority=BATCH)
+
+    @staticmethod
+    def _summaries_prompt(summaries: str, instructions: str) -> str:
+        prompt = PromptBuilder(summary_model.model)
+        prompt.add("Summaries of papers published:\n\n", truncatable=False)
+        prompt.add(f"{summaries}\n\n")
+        prompt.add(instructions, truncatable=False)
+        return prompt.build()
+
+    @traced("summarize.extract_key_points")
+    def extract_key_points(self, max_workers: int = KEY_POINTS_WORKERS) -> List[Dict[str, str]]:
         """
         Extracts key points or highlights from each paper.
 
+        Args:
+            max_workers (int): Number of papers processed concurrently.
+
         Returns:
             List[Dict[str, str]]: List of dictionaries containing paper title and key points.
         """
-        key_points_list = []
-        
-        for paper in self.papers:
-            prompt = (
-                f"Title: {paper['title']}\n"
-                f"Summary: {paper['summary']}\n\n"
-                "Extract the key points or most important highlights from this paper."
-            )
-            
-            key_points = summary_model.invoke(input=prompt)
-            key_points_list.append({"title": paper["title"], "key_points": key_points})
-        
-        return key_points_list
+        results = sorted(self._iter_key_points(max_workers), key=lambda result: result[0])
+        return [key_points for _, key_points in results]
+
+    def iter_key_points(self, max_workers: int = KEY_POINTS_WORKERS) -> Iterator[Dict[str, str]]:
+        """
+        Extracts key points like extract_key_points, yielding each paper's result as soon as it is ready.
+
+        Args:
+            max_workers (int): Number of papers processed concurrently.
+
+        Yields:
+            Dict[str, str]: Paper title and key points, in completion order.
+        """
+        for _, key_points in self._iter_key_points(max_workers):
+            yield key_points
+
+    def _iter_key_points(self, max_workers: int) -> Iterator[Tuple[int, Dict[str, str]]]:
+        # At most max_workers prompts are in flight, and a new one is only submitted
+        # after the caller has taken a finished result, so a slow consumer throttles
+        # generation instead of piling up completed results.
+        papers = enumerate(self.papers)
+        key_points_for = bind(self._key_points_for)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = set()
+            for index, paper in papers:
+                pending.add(pool.submit(key_points_for, index, paper))
+                if len(pending) >= max_workers:
+                    break
+
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                        next_paper: Optional[Tuple[int, Dict]] = next(papers, None)
+                        if next_paper is not None:
+                            pending.add(pool.submit(key_points_for, *next_paper))
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @classmethod
+    def _key_points_for(cls, index: int, paper: Dict) -> Tuple[int, Dict[str, str]]:
+        return index, cls.key_points_for_paper(paper)
+
+    @staticmethod
+    def key_points_for_paper(paper: Dict) -> Dict[str, str]:
+        """
+        Extracts the key points of a single paper, at batch priority.
+
+        Args:
+            paper (Dict): Paper details, including any key points already stored.
+
+        Returns:
+            Dict[str, str]: Paper ID, title and key points.
+        """
+        # Precomputed at ingest time by PaperArtifacts.enrich_papers, when current
+        if paper.get("key_points_version") == KEY_POINTS_TEMPLATE:
+            return {"paper_id": paper.get("paper_id"), "title": paper["title"], "key_points": paper["key_points"]}
+
+        prompt = (
+            f"Title: {paper['title']}\n"
+            f"Summary: {paper['summary']}\n\n"
+            "Extract the key points or most important highlights from this paper."
+        )
+
+        key_points = summary_model.invoke(input=prompt, template=KEY_POINTS_TEMPLATE, priority=BATCH)
+        return {"paper_id": paper.get("paper_id"), "title": paper["title"], "key_points": key_points}
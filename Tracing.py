@@ -0,0 +1,191 @@
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds, in seconds, of the latency histogram buckets
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Per-request profiling is opt-in twice over: the server must enable it and the request must ask
+PROFILING_ENABLED = os.environ.get("ENABLE_REQUEST_PROFILING") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", tempfile.gettempdir())
+
+_current_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_current_profiles: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = contextvars.ContextVar(
+    "current_profiles", default=None
+)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Latency histograms plus gauges pulled from registered collectors, rendered in
+        the Prometheus text exposition format.
+        """
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, value: str, seconds: float):
+        with self._lock:
+            key = (metric, label, value)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(seconds)
+
+    def register_collector(self, prefix: str, collector: Callable[[], Dict[str, float]]):
+        """
+        Adds gauges read from collector() at scrape time, each named prefix_key.
+        """
+        self._collectors.append((prefix, collector))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            for (metric, label, value), histogram in histograms:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram.total}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {histogram.count}')
+
+        for prefix, collector in self._collectors:
+            for key, value in collector().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Times a stage of request handling, adding it to the stage histogram and,
+    inside a traced request, to that request's Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("stage_duration_seconds", "stage", name, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+def traced(name: str) -> Callable:
+    """
+    Decorator form of span().
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind(func: Callable) -> Callable:
+    """
+    Carries the caller's trace and profiling request into func when it runs on another thread.
+
+    Use it on functions handed to a thread pool; context variables are not inherited there.
+    """
+    trace = _current_trace.get()
+    profiles = _current_profiles.get()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace_token = _current_trace.set(trace)
+        profiles_token = _current_profiles.set(profiles)
+        try:
+            return profiled(func, *args, **kwargs)
+        finally:
+            _current_trace.reset(trace_token)
+            _current_profiles.reset(profiles_token)
+    return wrapper
+
+def profiled(func: Callable, *args, **kwargs):
+    """
+    Runs func, under cProfile if the current request asked to be profiled.
+
+    Only work handed to threads this way is profiled; the event loop thread is shared
+    by every request, so profiling it would mix requests together.
+    """
+    profiles = _current_profiles.get()
+    if profiles is None:
+        return func(*args, **kwargs)
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is already active on this thread; run unprofiled
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+        profiles.append(profile)
+
+def start_trace(profile: bool = False) -> Tuple[contextvars.Token, contextvars.Token]:
+    trace_token = _current_trace.set([])
+    profiles_token = _current_profiles.set([] if profile and PROFILING_ENABLED else None)
+    return trace_token, profiles_token
+
+def end_trace(tokens: Tuple[contextvars.Token, contextvars.Token]) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+    """
+    Finishes the current trace.
+
+    Returns:
+        Tuple[List[Tuple[str, float]], Optional[str]]: The recorded spans, and the path of
+            the pstats dump if the request was profiled.
+    """
+    trace = _current_trace.get() or []
+    profiles = _current_profiles.get()
+    _current_trace.reset(tokens[0])
+    _current_profiles.reset(tokens[1])
+
+    profile_path = None
+    if profiles:
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        fd, profile_path = tempfile.mkstemp(dir=PROFILE_DIR, prefix="request-", suffix=".prof")
+        os.close(fd)
+        stats.dump_stats(profile_path)
+    return trace, profile_path
+
+def server_timing_header(spans: List[Tuple[str, float]]) -> str:
+    """
+    Formats spans as a Server-Timing header value, summing repeated stages.
+    """
+    totals: Dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
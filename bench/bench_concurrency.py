@@ -0,0 +1,67 @@
+"""
+Load benchmark for the FastAPI handlers against stub Neo4j and LLM backends.
+
+Fires N concurrent /generate_future_works/ and /get_papers/ requests and compares
+the wall time with what serial handling would cost. With the handlers off the
+event loop, N requests should take about one LLM latency, not N of them.
+
+Usage: python bench/bench_concurrency.py [--requests 16] [--llm-latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import LLMGateway
+import main
+from stubs import StubAsyncDatabase, StubLLM, make_papers
+
+async def timed_burst(client: httpx.AsyncClient, count: int, method: str, path: str, **kwargs) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.request(method, path, **kwargs) for _ in range(count)))
+    elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in responses), [r.status_code for r in responses]
+    return elapsed
+
+async def run(requests: int, llm_latency: float, db_latency: float) -> dict:
+    papers = make_papers(200)
+    main.db = StubAsyncDatabase(papers, latency=db_latency)
+    # The agents call the model through the shared llama3.1 gateway; stub its client, as run_benchmarks does
+    gateway = LLMGateway.get_llm("llama3.1")
+    gateway.llm = StubLLM(latency=llm_latency)
+    gateway.cache = None
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        future_works = await timed_burst(
+            client, requests, "POST", "/generate_future_works/", json={"paper_id": papers[0]["paper_id"]}
+        )
+        get_papers = await timed_burst(client, requests, "GET", "/get_papers/", params={"start_year": 2023})
+
+    return {
+        "requests": requests,
+        "agent_workers": main.agent_executor._max_workers,
+        "generate_future_works": {
+            "wall_s": round(future_works, 3),
+            "serial_estimate_s": round(requests * llm_latency, 3),
+            "speedup": round(requests * llm_latency / future_works, 2),
+        },
+        "get_papers": {
+            "wall_s": round(get_papers, 3),
+            "serial_estimate_s": round(requests * db_latency, 3),
+        },
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.llm_latency, args.db_latency)), indent=2))
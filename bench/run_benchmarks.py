@@ -0,0 +1,291 @@
+"""
+Offline benchmark suite for the ingest, query, QnA and key point hot paths.
+
+Neo4j, arXiv, Ollama and PDF downloads are replaced by the deterministic stand-ins in
+stubs.py, with configurable latencies, so runs are comparable across machines and
+commits. Results are printed as JSON, or written to --output.
+
+Usage: python bench/run_benchmarks.py [--output results.json] [--only ingest,qna]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+import DatabaseAgent
+import LLMGateway
+import QnAAgent
+from DatabaseAgent import Neo4jDatabase
+from PaperCache import PaperCache
+from PDFExtractor import PDFExtractor
+from RetrievalIndex import PaperIndexCache
+from SemanticIndex import SemanticIndex
+from SearchAgent import RateLimiter, harvest_pages, store_pages_in_database, store_papers_in_database
+from SummarizeFindingsAgent import SummarizeFindings
+from stubs import (
+    StubArxivClient, StubDriver, StubGraphDatabase, StubLLM, make_papers, make_sample_pdf, make_search_results
+)
+
+def summarize_latencies(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(1000 * statistics.median(samples), 3),
+        "p95_ms": round(1000 * samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        "max_ms": round(1000 * samples[-1], 3),
+    }
+
+def stub_database(driver: StubDriver) -> Neo4jDatabase:
+    DatabaseAgent.GraphDatabase = StubGraphDatabase(driver)
+    return Neo4jDatabase("neo4j://bench", "neo4j", "bench")
+
+def use_stub_llm(latency: float) -> StubLLM:
+    # Every agent shares the llama3.1 gateway; disable its cache so generation is measured
+    gateway = LLMGateway.get_llm("llama3.1")
+    gateway.llm = StubLLM(latency)
+    gateway.cache = None
+    return gateway.llm
+
+def bench_ingest(args) -> Dict:
+    driver = StubDriver(tx_latency=args.tx_latency, row_latency=args.row_latency)
+    db = stub_database(driver)
+    papers = make_search_results(args.ingest_papers)
+
+    start = time.perf_counter()
+    store_papers_in_database(papers, db, batch_size=args.batch_size)
+    first_pass = time.perf_counter() - start
+
+    # A second pass over unchanged papers measures the content-hash skip
+    start = time.perf_counter()
+    store_papers_in_database(papers, db, batch_size=args.batch_size)
+    second_pass = time.perf_counter() - start
+
+    return {
+        "papers": len(papers),
+        "batch_size": args.batch_size,
+        "transactions": driver.transactions,
+        "papers_per_s": round(len(papers) / first_pass, 1),
+        "unchanged_papers_per_s": round(len(papers) / second_pass, 1),
+    }
+
+def bench_harvest(args) -> Dict:
+    driver = StubDriver(tx_latency=args.tx_latency, row_latency=args.row_latency)
+    db = stub_database(driver)
+    client = StubArxivClient(papers_per_window=args.papers_per_window, latency=args.arxiv_latency)
+    since = datetime(datetime.now(timezone.utc).year - 1, 1, 1, tzinfo=timezone.utc)
+
+    first_write = None
+    original_store = db.store_papers_bulk
+
+    def timed_store(papers, batch_size):
+        nonlocal first_write
+        if first_write is None:
+            first_write = time.perf_counter() - start
+        return original_store(papers, batch_size=batch_size)
+
+    db.store_papers_bulk = timed_store
+    start = time.perf_counter()
+    pages = harvest_pages(
+        "bench", args.harvest_papers, since=since, client=client, rate_limiter=RateLimiter(args.arxiv_interval)
+    )
+    stored = store_pages_in_database(pages, db, batch_size=args.batch_size, flush_seconds=1.0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "papers": stored,
+        "arxiv_requests": client.requests,
+        "papers_per_s": round(stored / elapsed, 1),
+        "time_to_first_write_s": round(first_write or 0.0, 3),
+    }
+
+def bench_year_query(args) -> Dict:
+    driver = StubDriver(tx_latency=args.tx_latency, row_latency=args.row_latency)
+    db = stub_database(driver)
+    store_papers_in_database(make_search_results(args.query_papers), db, batch_size=args.batch_size)
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        papers = db.query_papers_by_year(2023)
+        samples.append(time.perf_counter() - start)
+
+    return {"papers_per_year": len(papers), **summarize_latencies(samples)}
+
+def bench_search(args) -> Dict:
+    papers = [
+        {"paper_id": f"search-{i}", "title": paper["title"], "summary": paper["summary"], "year": 2019 + i % 6}
+        for i, paper in enumerate(make_search_results(args.search_papers))
+    ]
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = SemanticIndex(index_dir)
+        start = time.perf_counter()
+        index.add(papers)
+        build = time.perf_counter() - start
+
+        # Appending to an existing index should cost about the same per paper as building it
+        start = time.perf_counter()
+        index.add([{**paper, "paper_id": f"appended-{i}"} for i, paper in enumerate(papers[:1000])])
+        append = time.perf_counter() - start
+
+        samples = []
+        for run in range(args.repeat):
+            start = time.perf_counter()
+            index.search(f"finding{run % 97} language models", k=10)
+            samples.append(time.perf_counter() - start)
+
+    return {
+        "papers": len(papers),
+        "backend": index.backend,
+        "build_papers_per_s": round(len(papers) / build, 1),
+        "append_papers_per_s": round(1000 / append, 1),
+        **summarize_latencies(samples),
+    }
+
+def bench_qna(args) -> Dict:
+    use_stub_llm(args.llm_latency)
+    results = {}
+    for pages in args.pdf_pages:
+        pdf_bytes = make_sample_pdf(pages)
+
+        def fake_get(url, **kwargs):
+            time.sleep(args.download_latency)
+            return SimpleNamespace(content=pdf_bytes, raise_for_status=lambda: None)
+
+        QnAAgent.requests.get = fake_get
+        cold, warm = [], []
+        for run in range(args.repeat):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                QnAAgent.paper_cache = PaperCache(cache_dir)
+                QnAAgent.paper_indexes = PaperIndexCache()
+                paper = {
+                    "paper_id": f"bench-{pages}-{run}",
+                    "title": "Benchmark paper",
+                    "summary": "A paper used to benchmark question answering.",
+                    "url": f"http://arxiv.org/pdf/bench{pages}.{run}.pdf",
+                }
+                agent = QnAAgent.QnAAgent([paper])
+
+                start = time.perf_counter()
+                agent.answer_question("What does term42 tell us about term7?", 0)
+                cold.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                agent.answer_question("How is term99 evaluated?", 0)
+                warm.append(time.perf_counter() - start)
+
+        results[f"{pages}_pages"] = {"cold": summarize_latencies(cold), "warm": summarize_latencies(warm)}
+    return {"llm_latency_ms": 1000 * args.llm_latency, **results}
+
+def sequential_extract(pdf_bytes: bytes) -> List[str]:
+    # The page loop QnAAgent used before PDFExtractor, as the baseline
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+        return [page.get_text() for page in pdf_doc]
+
+def bench_pdf_extraction(args) -> Dict:
+    extractor = PDFExtractor(max_workers=args.pdf_workers, min_parallel_pages=1)
+    start = time.perf_counter()
+    extractor.extract_pages(make_sample_pdf(args.pdf_workers))
+    pool_start = time.perf_counter() - start
+
+    results = {}
+    try:
+        for pages in args.extract_pages:
+            pdf_bytes = make_sample_pdf(pages)
+            expected = sequential_extract(pdf_bytes)
+            assert extractor.extract_pages(pdf_bytes) == expected
+
+            timings = {"sequential": [], "parallel": [], "parallel_max_chars": []}
+            for _ in range(args.repeat):
+                for name, extract in (
+                    ("sequential", lambda: sequential_extract(pdf_bytes)),
+                    ("parallel", lambda: extractor.extract_pages(pdf_bytes)),
+                    ("parallel_max_chars", lambda: extractor.extract_pages(pdf_bytes, max_chars=args.max_chars)),
+                ):
+                    start = time.perf_counter()
+                    extract()
+                    timings[name].append(time.perf_counter() - start)
+            results[f"{pages}_pages"] = {name: summarize_latencies(samples) for name, samples in timings.items()}
+    finally:
+        extractor.close()
+    return {"workers": args.pdf_workers, "pool_start_s": round(pool_start, 3), **results}
+
+def bench_key_points(args) -> Dict:
+    llm = use_stub_llm(args.llm_latency)
+    results = {}
+    for size in args.corpus_sizes:
+        agent = SummarizeFindings(make_papers(size))
+        calls_before = llm.calls
+        start = time.perf_counter()
+        agent.extract_key_points()
+        elapsed = time.perf_counter() - start
+        results[str(size)] = {
+            "wall_s": round(elapsed, 3),
+            "llm_calls": llm.calls - calls_before,
+            "papers_per_s": round(size / elapsed, 2),
+        }
+    return {"llm_latency_ms": 1000 * args.llm_latency, "corpus_sizes": results}
+
+BENCHMARKS: Dict[str, Callable] = {
+    "ingest": bench_ingest,
+    "harvest": bench_harvest,
+    "year_query": bench_year_query,
+    "search": bench_search,
+    "qna": bench_qna,
+    "pdf_extraction": bench_pdf_extraction,
+    "key_points": bench_key_points,
+}
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--only", help="Comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tx-latency", type=float, default=0.002, help="Seconds per Neo4j transaction")
+    parser.add_argument("--row-latency", type=float, default=0.00002, help="Seconds per Neo4j row")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--ingest-papers", type=int, default=10000)
+    parser.add_argument("--query-papers", type=int, default=5000)
+    parser.add_argument("--search-papers", type=int, default=100000)
+    parser.add_argument("--harvest-papers", type=int, default=2000)
+    parser.add_argument("--papers-per-window", type=int, default=150)
+    parser.add_argument("--arxiv-latency", type=float, default=0.05, help="Seconds per arXiv page")
+    parser.add_argument("--arxiv-interval", type=float, default=0.0, help="Rate limit between arXiv requests")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per LLM call")
+    parser.add_argument("--download-latency", type=float, default=0.1, help="Seconds per PDF download")
+    parser.add_argument("--pdf-pages", type=int_list, default=[10, 40])
+    parser.add_argument("--extract-pages", type=int_list, default=[20, 100, 300])
+    parser.add_argument("--pdf-workers", type=int, default=4)
+    parser.add_argument("--max-chars", type=int, default=100000, help="Early-stop budget for extraction")
+    parser.add_argument("--corpus-sizes", type=int_list, default=[10, 50, 100, 200])
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "only")},
+        "results": {},
+    }
+    for name in selected:
+        print(f"Running {name}...", file=sys.stderr)
+        report["results"][name] = BENCHMARKS[name](args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
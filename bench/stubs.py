@@ -0,0 +1,253 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+import fitz
+from DatabaseAgent import PAPER_FIELDS
+
+def make_papers(count: int, year: int = 2023) -> List[Dict]:
+    """
+    Builds deterministic fake papers shaped like the ones SearchAgent produces.
+    """
+    papers = []
+    for i in range(count):
+        papers.append({
+            "paper_id": f"stub-{year}-{i:06d}",
+            "title": f"Stub paper {i} on long-context language models",
+            "authors": [f"Author {i % 17}", f"Author {(i * 7) % 31}"],
+            "published_date": datetime(year, 1 + i % 12, 1 + i % 28, tzinfo=timezone.utc).isoformat(),
+            "summary": " ".join(f"finding{(i + j) % 97}" for j in range(150)),
+            "url": f"http://arxiv.org/abs/{year % 100:02d}{1 + i % 12:02d}.{i:05d}v1"
+        })
+    return papers
+
+def make_search_results(count: int, year: int = 2023) -> List[Dict]:
+    """
+    Builds deterministic fake papers in the shape search_papers yields, ready for ingest.
+    """
+    papers = []
+    for i in range(count):
+        papers.append({
+            "title": f"Stub paper {i} on long-context language models",
+            "authors": [f"Author {i % 17}", f"Author {(i * 7) % 31}"],
+            "published_date": datetime(year, 1 + i % 12, 1 + i % 28, tzinfo=timezone.utc),
+            "summary": " ".join(f"finding{(i + j) % 97}" for j in range(150)),
+            "url": f"http://arxiv.org/abs/{year % 100:02d}{1 + i % 12:02d}.{i:05d}v1",
+            "links": [f"http://arxiv.org/pdf/{year % 100:02d}{1 + i % 12:02d}.{i:05d}v1"]
+        })
+    return papers
+
+def make_sample_pdf(pages: int, words_per_page: int = 450) -> bytes:
+    """
+    Builds a text-only PDF with the given number of pages.
+    """
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = " ".join(f"term{(page_number * 31 + i) % 211}" for i in range(words_per_page))
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+class StubLLM:
+    def __init__(self, latency: float = 0.5):
+        """
+        Stand-in for OllamaLLM that sleeps for a fixed latency instead of generating.
+
+        Args:
+            latency (float): Seconds each invoke call takes.
+        """
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, input: str, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"Stub response to a {len(input)} character prompt."
+
+    def stream(self, input: str, **kwargs):
+        # Spreads the latency over the tokens, like a model generating them one at a time
+        self.calls += 1
+        tokens = f"Stub response to a {len(input)} character prompt.".split(" ")
+        for i, token in enumerate(tokens):
+            time.sleep(self.latency / len(tokens))
+            yield token if i == 0 else " " + token
+
+    async def astream(self, input: str, **kwargs):
+        self.calls += 1
+        tokens = f"Stub response to a {len(input)} character prompt.".split(" ")
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self.latency / len(tokens))
+            yield token if i == 0 else " " + token
+
+class StubAsyncDatabase:
+    def __init__(self, papers: List[Dict], latency: float = 0.01):
+        """
+        Stand-in for AsyncNeo4jDatabase serving papers from memory.
+
+        Args:
+            papers (List[Dict]): The papers to serve.
+            latency (float): Seconds each query takes.
+        """
+        self.papers = papers
+        self.latency = latency
+
+    async def query_papers_by_year(self, year: int) -> List[Dict]:
+        await asyncio.sleep(self.latency)
+        return [paper for paper in self.papers if paper["published_date"].startswith(str(year))]
+
+    async def iter_papers_by_year(
+        self, year: int, fields: Optional[List[str]] = None, after: str = "", limit: int = 100
+    ) -> AsyncIterator[Dict]:
+        await asyncio.sleep(self.latency)
+        papers = sorted(await self.query_papers_by_year(year), key=lambda paper: paper["paper_id"])
+        fields = ["paper_id"] + [field for field in fields or PAPER_FIELDS if field != "paper_id"]
+        for paper in [paper for paper in papers if paper["paper_id"] > after][:limit]:
+            yield {field: paper.get(field) for field in fields}
+
+    async def get_paper_by_id(self, paper_id: str) -> Optional[Dict]:
+        await asyncio.sleep(self.latency)
+        return next((paper for paper in self.papers if paper["paper_id"] == paper_id), None)
+
+    async def papers_by_author(self, name: str, limit: int = 50) -> List[Dict]:
+        await asyncio.sleep(self.latency)
+        return [paper for paper in self.papers if name in paper["authors"]][:limit]
+
+    async def related_papers(self, paper_id: str, limit: int = 10) -> List[Dict]:
+        await asyncio.sleep(self.latency)
+        return []
+
+    def pool_metrics(self) -> Dict:
+        return {}
+
+    async def close(self):
+        pass
+
+class StubResult:
+    def __init__(self, records: List[Dict]):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self) -> Optional[Dict]:
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return SimpleNamespace(counters=SimpleNamespace(properties_set=0))
+
+class StubTransaction:
+    def __init__(self, driver: "StubDriver"):
+        self.driver = driver
+
+    def run(self, query: str, **params) -> StubResult:
+        # Recognizes the handful of Neo4jDatabase queries the benchmarks exercise
+        if "UNWIND $rows" in query and "MERGE (p:Paper" in query:
+            rows = params["rows"]
+            time.sleep(self.driver.row_latency * len(rows))
+            written = []
+            for row in rows:
+                stored = self.driver.papers.get(row["paper_id"])
+                if stored is None or stored.get("content_hash") != row["content_hash"]:
+                    self.driver.papers[row["paper_id"]] = dict(row)
+                    written.append({"paper_id": row["paper_id"]})
+            return StubResult(written)
+
+        if "p.year = $year" in query:
+            papers = [paper for paper in self.driver.papers.values() if paper["year"] == params["year"]]
+            time.sleep(self.driver.row_latency * len(papers))
+            return StubResult(papers)
+
+        if "{paper_id: $paper_id}" in query:
+            paper = self.driver.papers.get(params["paper_id"])
+            return StubResult([paper] if paper else [])
+
+        return StubResult([])
+
+class StubSession:
+    def __init__(self, driver: "StubDriver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute_read(self, tx_fn, *args):
+        return self._transaction(tx_fn, *args)
+
+    def execute_write(self, tx_fn, *args):
+        return self._transaction(tx_fn, *args)
+
+    def run(self, query: str, **params) -> StubResult:
+        return self._transaction(lambda tx: tx.run(query, **params))
+
+    def _transaction(self, tx_fn, *args):
+        self.driver.transactions += 1
+        time.sleep(self.driver.tx_latency)
+        return tx_fn(StubTransaction(self.driver), *args)
+
+class StubDriver:
+    def __init__(self, tx_latency: float = 0.002, row_latency: float = 0.00002):
+        """
+        In-memory stand-in for the sync Neo4j driver.
+
+        Args:
+            tx_latency (float): Seconds of round trip per transaction.
+            row_latency (float): Seconds of server work per row written or returned.
+        """
+        self.tx_latency = tx_latency
+        self.row_latency = row_latency
+        self.papers: Dict[str, Dict] = {}
+        self.transactions = 0
+
+    def session(self, **config) -> StubSession:
+        return StubSession(self)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+class StubGraphDatabase:
+    def __init__(self, driver: StubDriver):
+        """
+        Replaces DatabaseAgent.GraphDatabase so Neo4jDatabase builds on a StubDriver.
+        """
+        self._driver = driver
+
+    def driver(self, uri, auth=None, **config) -> StubDriver:
+        return self._driver
+
+class StubArxivClient:
+    def __init__(self, papers_per_window: int = 150, latency: float = 0.05):
+        """
+        Stand-in for arxiv.Client serving deterministic results for any monthly window.
+
+        Args:
+            papers_per_window (int): Number of results each window's query has.
+            latency (float): Seconds each page request takes.
+        """
+        self.papers_per_window = papers_per_window
+        self.latency = latency
+        self.requests = 0
+
+    def results(self, search, offset: int = 0):
+        self.requests += 1
+        time.sleep(self.latency)
+        window = re.search(r"submittedDate:\[(\d{4})(\d{2})(\d{2})", search.query)
+        year, month, day = (int(part) for part in window.groups())
+        for i in range(offset, min(self.papers_per_window, search.max_results)):
+            yield SimpleNamespace(
+                entry_id=f"http://arxiv.org/abs/{year % 100:02d}{month:02d}.{i:05d}v1",
+                title=f"Stub paper {i} from {year}-{month:02d}",
+                authors=[SimpleNamespace(name=f"Author {i % 17}")],
+                published=datetime(year, month, min(day + i % 27, 28), tzinfo=timezone.utc),
+                summary=" ".join(f"finding{(i + j) % 97}" for j in range(150)),
+                links=[]
+            )
@@ -1,5 +1,7 @@
 import streamlit as st
 import requests
+import json
+import time
 
 st.title("Academic Research Paper Assistant Application")
 
@@ -11,21 +13,177 @@ st.header("Query Papers by Year")
 start_year = st.number_input("Enter Start Year", min_value=2000, max_value=2024, value=2019)
 query_button = st.button("Retrieve Papers")
 
-# Initialize session state for selected paper ID
+# Initialize session state for selected paper ID and the titles loaded so far
 if "selected_id" not in st.session_state:
     st.session_state.selected_id = None
+if "paper_id_options" not in st.session_state:
+    st.session_state.paper_id_options = {}
+    st.session_state.next_cursor = None
 
-if query_button:
-    response = requests.get(f"{api_url}/get_papers/", params={"start_year": start_year})
+def stream_tokens(path, payload):
+    """
+    Yields the tokens of a Server-Sent Events endpoint as they arrive.
+    """
+    with requests.post(f"{api_url}{path}", json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                token = json.loads(line[len("data: "):])
+                if isinstance(token, str):
+                    yield token
+
+def render_stream(path, payload, placeholder):
+    # Redraw the placeholder with the text received so far, so tokens appear as they are generated
+    text = ""
+    for token in stream_tokens(path, payload):
+        text += token
+        placeholder.markdown(text)
+    return text
+
+# Background jobs started from the sections below, by kind. Kept in session state so a
+# rerun of the page, from any widget interaction, keeps polling them instead of losing them.
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+
+# The output areas of this run's jobs, filled in by poll_jobs() at the end of the page
+job_views = {}
+
+def submit_job(kind, year, error_message):
+    response = requests.post(f"{api_url}/jobs/{kind}", json={"year": year})
+    if response.status_code == 200:
+        st.session_state.jobs[kind] = response.json()["job_id"]
+    else:
+        st.error(error_message)
+
+def show_job(kind, heading, render_result=None, render_item=None, result_items=None):
+    """
+    Reserves this section's place for a job's progress and output, if one is running.
+
+    Args:
+        kind: The job's kind.
+        heading: Written above the output.
+        render_result: Renders the finished job's result into a container.
+        render_item: Renders one of the per-paper results the job saved so far; these
+            are shown while it runs.
+        result_items: Picks the per-paper results out of the finished job's result, so
+            those not shown yet are rendered with render_item.
+    """
+    if kind not in st.session_state.jobs:
+        return
+    area = st.container()
+    job_views[kind] = {
+        "job_id": st.session_state.jobs[kind],
+        "heading": heading,
+        "progress": area.progress(0.0, text="Queued..."),
+        "output": area.container(),
+        "render_result": render_result,
+        "render_item": render_item,
+        "result_items": result_items,
+        "offset": 0,
+        "shown": set(),
+    }
+
+def show_items(view, items):
+    for item in items:
+        if item["paper_id"] in view["shown"]:
+            continue
+        if not view["shown"]:
+            view["output"].write(view["heading"])
+        view["shown"].add(item["paper_id"])
+        view["render_item"](view["output"], item)
+
+def finish_job(kind, view, job):
+    view["progress"].empty()
+    if job["status"] == "failed":
+        view["output"].error(job["error"])
+    elif view["result_items"] is not None:
+        show_items(view, view["result_items"](job["result"]))
+    else:
+        view["output"].write(view["heading"])
+        view["render_result"](view["output"], job["result"])
+    del st.session_state.jobs[kind]
+    del job_views[kind]
+
+def poll_jobs():
+    """
+    Polls every running job on the page every 2 seconds until all are done, updating
+    their progress bars and showing per-paper results as they are saved.
+    """
+    while job_views:
+        for kind, view in list(job_views.items()):
+            response = requests.get(f"{api_url}/jobs/{view['job_id']}")
+            if response.status_code != 200:
+                view["progress"].empty()
+                view["output"].error("The job was lost.")
+                del st.session_state.jobs[kind]
+                del job_views[kind]
+                continue
+            job = response.json()
+
+            if view["render_item"] is not None and job["status"] == "running":
+                page = requests.get(f"{api_url}/jobs/{view['job_id']}/items", params={"offset": view["offset"]}).json()
+                show_items(view, page["items"])
+                view["offset"] = page["next_offset"]
+
+            if job["status"] in ("done", "failed"):
+                finish_job(kind, view, job)
+                continue
+
+            done, total = job["progress"]["done"], job["progress"]["total"]
+            if total:
+                view["progress"].progress(done / total, text=f"{done} of {total} papers processed")
+            else:
+                view["progress"].progress(0.0, text=f"{job['status'].capitalize()}...")
+        if job_views:
+            time.sleep(2)
+
+def render_key_points(area, item):
+    area.subheader(item["title"])
+    area.write(item["key_points"])
+
+def load_papers_page(year, cursor=None):
+    # Only titles and IDs are needed for the selectbox, one page at a time
+    response = requests.get(
+        f"{api_url}/get_papers/",
+        params={"start_year": year, "fields": "paper_id,title", "limit": 100, "cursor": cursor}
+    )
     if response.status_code == 200:
-        papers = response.json()
-        paper_id_options = {paper["title"]: paper["paper_id"] for paper in papers}
-        selected_title = st.selectbox("Select a Paper", list(paper_id_options.keys()))
-        st.session_state.selected_id = paper_id_options[selected_title]  # Store in session state
-        st.write("Selected Paper ID:", st.session_state.selected_id)
+        page = response.json()
+        st.session_state.paper_id_options.update({paper["title"]: paper["paper_id"] for paper in page["papers"]})
+        st.session_state.next_cursor = page["next_cursor"]
     else:
         st.error("Error retrieving papers.")
 
+# Semantic search across every stored paper fills the same selectbox
+search_query = st.text_input("Or search all papers by topic")
+search_button = st.button("Search")
+
+if search_button and search_query:
+    response = requests.get(f"{api_url}/search/", params={"q": search_query, "k": 25})
+    if response.status_code == 200:
+        results = response.json()["results"]
+        st.session_state.paper_id_options = {f"{paper['title']} ({paper['year']})": paper["paper_id"] for paper in results}
+        st.session_state.next_cursor = None
+        if not results:
+            st.warning("No matching papers found.")
+    else:
+        st.error("Error searching papers.")
+
+if query_button:
+    st.session_state.paper_id_options = {}
+    st.session_state.next_cursor = None
+    load_papers_page(start_year)
+
+if st.session_state.paper_id_options:
+    paper_id_options = st.session_state.paper_id_options
+    selected_title = st.selectbox("Select a Paper", list(paper_id_options.keys()))
+    st.session_state.selected_id = paper_id_options[selected_title]  # Store in session state
+    st.write("Selected Paper ID:", st.session_state.selected_id)
+
+    if st.session_state.next_cursor and st.button("Load More Papers"):
+        load_papers_page(start_year, st.session_state.next_cursor)
+        st.rerun()
+
 # 2. Q&A Section
 st.header("Question and Answer on Papers")
 question = st.text_input("Enter Your Question")
@@ -34,15 +192,16 @@ qa_button = st.button("Get Answer")
 # Use selected_id from session state for Q&A if it’s not None
 if qa_button:
     if st.session_state.selected_id:
-        response = requests.post(
-            f"{api_url}/answer_question/",
-            json={"question": question, "paper_id": st.session_state.selected_id}  # Pass paper_id as string
-        )
-        if response.status_code == 200:
-            st.write("Answer:", response.json()["answer"])
-        else:
+        st.write("Answer:")
+        try:
+            render_stream(
+                "/answer_question/stream",
+                {"question": question, "paper_id": st.session_state.selected_id},  # Pass paper_id as string
+                st.empty()
+            )
+        except requests.HTTPError as e:
             st.error("Error in processing the question.")
-            st.write("Response content:", response.text)
+            st.write("Response content:", e.response.text)
     else:
         st.warning("Please select a paper before asking a question.")
 
@@ -52,11 +211,10 @@ generate_button = st.button("Generate Future Works")
 
 if generate_button:
     if st.session_state.selected_id:
-        response = requests.post(f"{api_url}/generate_future_works/", json={"paper_id": st.session_state.selected_id})
-        if response.status_code == 200:
-            st.write("Future Research Suggestions:")
-            st.write(response.json()["future_work"])
-        else:
+        st.write("Future Research Suggestions:")
+        try:
+            render_stream("/generate_future_works/stream", {"paper_id": st.session_state.selected_id}, st.empty())
+        except requests.HTTPError:
             st.error("Failed to generate future research directions.")
     else:
         st.warning("Please select a paper before generating future works.")
@@ -68,12 +226,11 @@ year = st.number_input("Enter Year for Summary", min_value=2000, max_value=2024,
 summarize_button = st.button("Summarize Findings")
 
 if summarize_button:
-    response = requests.post(f"{api_url}/summarize_findings/", json={"year": year})
-    if response.status_code == 200:
-        st.write("Summary of Findings:")
-        st.write(response.json()["findings_summary"])
-    else:
-        st.error("Failed to summarize findings.")
+    submit_job("summarize_findings", year, "Failed to summarize findings.")
+show_job(
+    "summarize_findings", "Summary of Findings:",
+    render_result=lambda area, result: area.write(result["findings_summary"])
+)
 
 # 5. Generate Future Works from Summaries Section
 st.header("Generate Future Work Suggestions for Papers Over a Year")
@@ -81,12 +238,11 @@ year_for_future_work = st.number_input("Enter Year for Future Work Suggestions",
 generate_future_works_button = st.button("Generate Future Works for the Year")
 
 if generate_future_works_button:
-    response = requests.post(f"{api_url}/generate_future_works_from_year/", json={"year": year_for_future_work})
-    if response.status_code == 200:
-        st.write("Suggested Future Work Areas:")
-        st.write(response.json()["future_works_summary"])
-    else:
-        st.error("Failed to generate future work suggestions.")
+    submit_job("generate_future_works_from_year", year_for_future_work, "Failed to generate future work suggestions.")
+show_job(
+    "generate_future_works_from_year", "Suggested Future Work Areas:",
+    render_result=lambda area, result: area.write(result["future_works_summary"])
+)
 
 # 6. Extract Key Points Section
 st.header("Extract Key Points from Papers Over a Year")
@@ -94,12 +250,26 @@ year_for_key_points = st.number_input("Enter Year for Key Points Extraction", mi
 extract_key_points_button = st.button("Extract Key Points")
 
 if extract_key_points_button:
-    response = requests.post(f"{api_url}/extract_key_points/", json={"year": year_for_key_points})
-    if response.status_code == 200:
-        st.write("Key Points from Papers:")
-        for item in response.json()["key_points"]:
-            st.subheader(item["title"])
-            st.write(item["key_points"])
-    else:
-        st.error("Failed to extract key points.")
+    submit_job("extract_key_points", year_for_key_points, "Failed to extract key points.")
+# Each paper's key points are shown as soon as they are saved, not only when the job is done
+show_job(
+    "extract_key_points", "Key Points from Papers:",
+    render_item=render_key_points,
+    result_items=lambda result: result["key_points"]
+)
+
+# 7. Review Paper Section
+st.header("Generate a Review Paper for a Year")
+year_for_review = st.number_input("Enter Year for the Review Paper", min_value=2000, max_value=2024, value=2019)
+review_paper_button = st.button("Generate Review Paper")
+
+if review_paper_button:
+    submit_job("create_review_paper", year_for_review, "Failed to generate the review paper.")
+show_job(
+    "create_review_paper", "Review Paper:",
+    render_result=lambda area, result: area.markdown(result["review_paper"])
+)
+
+# Runs last, so every section is drawn before the page starts waiting on its jobs
+poll_jobs()
 
@@ -1,75 +1,342 @@
-from fastapi import FastAPI, HTTPException, Body
-from typing import List, Optional
-from DatabaseAgent import Neo4jDatabase
-from QnAAgent import QnAAgent
-from FutureWorksAgent import FutureWorksAgent
+from fastapi import FastAPI, HTTPException, Body, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import AsyncIterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
+import os
+import time
+from DatabaseAgent import AsyncNeo4jDatabase, neo4j_settings_from_env
+from QnAAgent import QnAAgent, QUEUE_TIMEOUT_SECONDS, qa_model, pdf_extractor
+from JobQueue import DONE, JobQueue
+from JobWorkers import HANDLERS, JobWorkerPool
+from FutureWorksAgent import FutureWorksAgent, FUTURE_WORK_TEMPLATE, RELATED_CONTEXT_PAPERS, future_model
 from SummarizeFindingsAgent import SummarizeFindings
+from LLMGateway import response_cache
+from LLMScheduler import INTERACTIVE, DeadlineExceeded, scheduler
+from SemanticIndex import SemanticIndex
+from SingleFlight import AsyncSingleFlight, stats as singleflight_stats
+import Tracing
 
-app = FastAPI()
+# Created per process in lifespan(); pool settings come from the NEO4J_* environment variables
+db: Optional[AsyncNeo4jDatabase] = None
 
-neo4j_uri = "neo4j://localhost:7687"
-neo4j_user = "neo4j"
-neo4j_password = "password"
-db = Neo4jDatabase(neo4j_uri, neo4j_user, neo4j_password)
+# The agents block on PDF downloads, PyMuPDF and Ollama generation, so they run
+# in this pool instead of on the event loop. Its size caps concurrent agent work.
+agent_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("AGENT_WORKERS", "8")))
+
+# Built at ingest time by SearchData.py; every worker maps the same files
+search_index = SemanticIndex()
+
+# Concurrent requests for the same year share one query and one corpus-wide generation
+year_queries = AsyncSingleFlight("papers_by_year")
+year_summaries = AsyncSingleFlight("summarize_findings")
+year_future_works = AsyncSingleFlight("year_future_works")
+
+# Long-running year-level and review paper generation runs in worker processes, not in the request
+job_queue = JobQueue()
+job_workers = JobWorkerPool(job_queue)
+
+async def run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+    # bind() carries the request's trace and profiling request into the worker thread
+    return await loop.run_in_executor(agent_executor, functools.partial(Tracing.bind(func), *args))
+
+async def sse_tokens(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Frames model output as Server-Sent Events: one JSON-encoded token per event,
+    then a final "done" event.
+
+    Starlette cancels this generator when the client disconnects, which closes the
+    model's stream and stops the generation.
+    """
+    async for chunk in chunks:
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+def sse_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        sse_tokens(chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def started(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Waits for the first chunk before the response is sent, so a DeadlineExceeded raised
+    while the stream waits for a model slot still reaches the client as a 503.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def resumed() -> AsyncIterator[str]:
+        try:
+            if first is not None:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+        finally:
+            # Hands the model slot back as soon as the client goes away
+            await chunks.aclose()
+
+    return resumed()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db
+    db = AsyncNeo4jDatabase(*neo4j_settings_from_env())
+    try:
+        await db.verify_connectivity()
+        await db.ensure_schema()
+        job_workers.start()
+        yield
+    finally:
+        job_workers.stop()
+        # Generations cut off by the shutdown would otherwise keep their slots until the lease expires
+        if scheduler.slots is not None:
+            scheduler.slots.release_pids([os.getpid()])
+        await db.close()
+        agent_executor.shutdown(wait=False)
+        pdf_extractor.close()
+
+app = FastAPI(lifespan=lifespan)
+
+Tracing.registry.register_collector("llm_cache", response_cache.stats)
+Tracing.registry.register_collector("neo4j_pool", lambda: db.pool_metrics() if db is not None else {})
+Tracing.registry.register_collector("singleflight", singleflight_stats)
+Tracing.registry.register_collector("llm_scheduler", scheduler.stats)
+Tracing.registry.register_collector("jobs", job_queue.stats)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    # The model server is saturated; tell the client to come back rather than wait longer
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Records per-stage spans for each request and returns them as a Server-Timing header.
+    With ENABLE_REQUEST_PROFILING=1 on the server, an X-Profile: 1 request header also
+    dumps a cProfile of the request's agent work and returns its path in X-Profile-File.
+    """
+    tokens = Tracing.start_trace(profile=request.headers.get("X-Profile") == "1")
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        spans, profile_path = Tracing.end_trace(tokens)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    Tracing.registry.observe("http_request_duration_seconds", "path", path, elapsed)
+
+    response.headers["Server-Timing"] = Tracing.server_timing_header(spans + [("total", elapsed)])
+    if profile_path:
+        response.headers["X-Profile-File"] = profile_path
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return Tracing.registry.render()
 
 @app.get("/get_papers/")
-async def get_papers(start_year: int):
-    papers = db.query_papers_by_year(start_year)
-    if not papers:
+async def get_papers(
+    start_year: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None
+):
+    """
+    Returns one page of a year's papers. Pass next_cursor back as cursor to get the
+    following page, and a comma-separated fields list to only return those properties.
+    """
+    field_list = [field.strip() for field in fields.split(",")] if fields else None
+    try:
+        # Fetch one extra record to find out whether there is another page
+        papers = [paper async for paper in db.iter_papers_by_year(start_year, field_list, cursor or "", limit + 1)]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not papers and cursor is None:
         raise HTTPException(status_code=404, detail="No papers found for the specified year.")
-    return papers
+
+    next_cursor = None
+    if len(papers) > limit:
+        papers = papers[:limit]
+        next_cursor = papers[-1]["paper_id"]
+    return {"papers": papers, "next_cursor": next_cursor}
+
+@app.get("/search/")
+async def search(
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    year: Optional[int] = None
+):
+    """
+    Finds papers across all years whose title and summary best match a free-text query.
+    """
+    results = await run_blocking(search_index.search, q, k, year)
+    return {"results": results}
 
 @app.post("/answer_question/")
 async def answer_question(
     question: str = Body(..., embed=True),
     paper_id: str = Body(..., embed=True)  
 ):
-    paper = db.get_paper_by_id(paper_id)
+    paper = await db.get_paper_by_id(paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
     agent = QnAAgent([paper])
-    answer = agent.answer_question(question, 0) 
+    answer = await run_blocking(agent.answer_question, question, 0)
     return {"answer": answer}
 
+@app.post("/answer_question/stream")
+async def answer_question_stream(
+    question: str = Body(..., embed=True),
+    paper_id: str = Body(..., embed=True)
+):
+    """
+    Streams the answer token by token as Server-Sent Events.
+    """
+    paper = await db.get_paper_by_id(paper_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found.")
+    agent = QnAAgent([paper])
+    # The PDF download and retrieval still block, so only the generation is streamed
+    prompt = await run_blocking(agent.question_prompt, question, 0)
+    chunks = qa_model.astream(prompt, priority=INTERACTIVE, timeout=QUEUE_TIMEOUT_SECONDS)
+    return sse_response(await started(chunks))
+
 @app.post("/generate_future_works/")
 async def future_works(paper_id: str = Body(..., embed=True)):
-    paper = db.get_paper_by_id(paper_id)
+    paper = await db.get_paper_by_id(paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
     agent = FutureWorksAgent([paper])
-    future_work = agent.generate_future_work(0) 
+    if agent.stored_future_work(0) is None:
+        paper["related_papers"] = await db.related_papers(paper_id, limit=RELATED_CONTEXT_PAPERS)
+    future_work = await run_blocking(agent.generate_future_work, 0)
     return {"future_work": future_work}
 
-@app.post("/summarize_findings/")
-async def summarize_findings(year: int = Body(..., embed=True)):
-    papers = db.query_papers_by_year(year)
+@app.post("/generate_future_works/stream")
+async def future_works_stream(paper_id: str = Body(..., embed=True)):
+    """
+    Streams the future work suggestions token by token as Server-Sent Events.
+    """
+    paper = await db.get_paper_by_id(paper_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found.")
+    agent = FutureWorksAgent([paper])
+    stored = agent.stored_future_work(0)
+    if stored is not None:
+        return sse_response(single_chunk(stored))
+    paper["related_papers"] = await db.related_papers(paper_id, limit=RELATED_CONTEXT_PAPERS)
+    chunks = future_model.astream(agent.future_work_prompt(0), template=FUTURE_WORK_TEMPLATE, priority=INTERACTIVE)
+    return sse_response(await started(chunks))
+
+async def papers_for_year(year: int) -> List[dict]:
+    papers = await year_queries.do(year, lambda: db.query_papers_by_year(year))
     if not papers:
         raise HTTPException(status_code=404, detail="No papers found for the specified year.")
+    return papers
+
+async def summarize_year(year: int) -> str:
+    agent = SummarizeFindings(await papers_for_year(year))
+    return await run_blocking(agent.summarize_findings)
+
+async def future_works_for_year(year: int) -> str:
+    agent = SummarizeFindings(await papers_for_year(year))
+    return await run_blocking(agent.generate_future_works_from_year)
 
-    agent = SummarizeFindings(papers)
-    findings_summary = agent.summarize_findings()
+@app.get("/papers_by_author/")
+async def papers_by_author(name: str, limit: int = Query(50, ge=1, le=500)):
+    return {"papers": await db.papers_by_author(name, limit)}
+
+@app.get("/related_papers/")
+async def related_papers(paper_id: str, limit: int = Query(10, ge=1, le=100)):
+    """
+    Papers within two hops of a paper in the citation and author graph, best connected first.
+    """
+    return {"related_papers": await db.related_papers(paper_id, limit)}
+
+@app.post("/summarize_findings/")
+async def summarize_findings(year: int = Body(..., embed=True)):
+    findings_summary = await year_summaries.do(year, lambda: summarize_year(year))
     return {"findings_summary": findings_summary}
 
 @app.post("/generate_future_works_from_year/")
 async def generate_future_works_from_year(year: int = Body(..., embed=True)):
-    papers = db.query_papers_by_year(year)
-    if not papers:
-        raise HTTPException(status_code=404, detail="No papers found for the specified year.")
-
-    agent = SummarizeFindings(papers)
-    future_works_summary = agent.generate_future_works_from_year()
+    future_works_summary = await year_future_works.do(year, lambda: future_works_for_year(year))
     return {"future_works_summary": future_works_summary}
 
 @app.post("/extract_key_points/")
 async def extract_key_points(year: int = Body(..., embed=True)):
-    papers = db.query_papers_by_year(year)
-    if not papers:
-        raise HTTPException(status_code=404, detail="No papers found for the specified year.")
-
-    agent = SummarizeFindings(papers)
-    key_points_list = agent.extract_key_points()
+    agent = SummarizeFindings(await papers_for_year(year))
+    key_points_list = await run_blocking(agent.extract_key_points)
     return {"key_points": key_points_list}
 
-@app.on_event("shutdown")
-def shutdown_event():
-    db.close()
+@app.post("/extract_key_points/stream")
+async def extract_key_points_stream(year: int = Body(..., embed=True)):
+    agent = SummarizeFindings(await papers_for_year(year))
+    # One JSON object per line, sent as soon as each paper's key points are ready
+    lines = (json.dumps(key_points) + "\n" for key_points in agent.iter_key_points())
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/jobs/{kind}")
+async def submit_job(kind: str, year: int = Body(..., embed=True)):
+    """
+    Queues a year-level job and returns at once; poll status_url for its progress and result.
+    Submitting a job identical to one still queued or running returns that job instead.
+    """
+    if kind not in HANDLERS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind. Choose from: {', '.join(HANDLERS)}.")
+    job_id = await run_blocking(job_queue.submit, kind, {"year": year})
+    return {"job_id": job_id, "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/jobs/{job_id}/items")
+async def job_items(job_id: str, offset: int = Query(0, ge=0)):
+    """
+    Returns the per-paper results a running job has saved so far, such as each paper's key
+    points, skipping the first offset. They are dropped once the job is done and has its result.
+    """
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    items = await run_blocking(job_queue.items, job_id, offset)
+    return {"items": list(items.values()), "next_offset": offset + len(items)}
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+    return job["result"]
+
+@app.get("/llm_cache/stats")
+async def llm_cache_stats():
+    return response_cache.stats()
+
+@app.get("/llm_scheduler/stats")
+async def llm_scheduler_stats():
+    return scheduler.stats()
+
+@app.get("/pool_metrics")
+async def pool_metrics():
+    return db.pool_metrics()